@@ -0,0 +1,127 @@
+"""
+端到端压测
+
+在本地模拟服务器上以不同账户数量与并发数执行sign_in_all/sign_out_all，记录每秒完成的账户数、
+单个账户耗时的p50/p99与服务器收到的请求数
+
+    python benchmarks/bench_e2e.py [--counts 10 100 500] [--workers 1 8] [--latency 20] [--lazy] [--adaptive]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import webhooks  # noqa: E402
+from xyb import XybSign  # noqa: E402
+from mock_server import MockServer  # noqa: E402
+
+
+class TimedXybSign(XybSign):
+    """记录每个账户任务耗时的XybSign"""
+
+    def __init__(self, *args, **kwargs):
+        self.timings = list()
+        self._timings_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _run_task(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super()._run_task(*args, **kwargs)
+        finally:
+            with self._timings_lock:
+                self.timings.append(time.perf_counter() - start)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def make_accounts(count: int) -> str:
+    fd, file = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as fp:
+        json.dump([{
+            "username": f"1340000{i:06d}",
+            "password": "password",
+            "location": {"adcode": 440305, "address": "广东省深圳市南山区", "lat": 0, "lng": 0}
+        } for i in range(count)], fp, ensure_ascii=False)
+    return file
+
+
+def run(count: int, workers: int, options: dict, server_options: dict) -> list:
+    """执行一组签到与签退，返回两行结果"""
+    server = MockServer(**server_options)
+    XybSign.set_base_url(server.start())
+    file = make_accounts(count)
+    rows = list()
+    try:
+        start = time.perf_counter()
+        tools = TimedXybSign(file, workers=workers, **options)
+        load_time = time.perf_counter() - start
+        for name, sign_type in (("签到", True), ("签退", False)):
+            # 签到的耗时与请求数包括账户载入
+            before = 0 if sign_type else server.stats()["total"]
+            tools.timings.clear()
+            start = time.perf_counter()
+            report = tools.sign_in_all() if sign_type else tools.sign_out_all()
+            elapsed = time.perf_counter() - start + (load_time if sign_type else 0)
+            rows.append({
+                "task": name,
+                "accounts": count,
+                "workers": workers,
+                "success": report["success"],
+                "accounts_per_sec": count / elapsed,
+                "p50_ms": percentile(tools.timings, 0.5) * 1000,
+                "p99_ms": percentile(tools.timings, 0.99) * 1000,
+                "requests": server.stats()["total"] - before
+            })
+    finally:
+        os.remove(file)
+        server.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 500], help="账户数量")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8], help="并发数")
+    parser.add_argument("--latency", type=float, default=20, help="服务器平均延迟(毫秒)")
+    parser.add_argument("--jitter", type=float, default=5, help="服务器延迟波动(毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0, help="服务器返回错误页面的概率")
+    parser.add_argument("--rate-limit", type=float, default=0, help="服务器每秒允许的请求数")
+    parser.add_argument("--lazy", action="store_true", help="延迟登录")
+    parser.add_argument("--streaming", action="store_true", help="流式执行")
+    parser.add_argument("--adaptive", action="store_true", help="自适应并发限制")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    webhooks.on_sign_in = webhooks.on_sign_out = webhooks.on_batch_complete = lambda data: None
+    options = dict(lazy=args.lazy, streaming=args.streaming, adaptive=args.adaptive)
+    server_options = dict(latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+                          rate_limit=args.rate_limit)
+    rows = list()
+    for count in args.counts:
+        for workers in args.workers:
+            rows.extend(run(count, workers, options, server_options))
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print(f"{'任务':<4} {'账户数':>6} {'并发':>4} {'成功':>6} {'账户/秒':>8} {'p50(ms)':>8} {'p99(ms)':>8} {'请求数':>6}")
+    for row in rows:
+        print(f"{row['task']:<4} {row['accounts']:>6} {row['workers']:>4} {row['success']:>6} "
+              f"{row['accounts_per_sec']:>8.1f} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['requests']:>6}")
+
+
+if __name__ == '__main__':
+    main()
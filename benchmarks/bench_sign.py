@@ -0,0 +1,116 @@
+"""
+签名组件基准测试
+
+先校验固定noce/now_time下的签名向量，再对比旧版逐次构建的签名实现与signer模块的每秒签名数
+
+    python benchmarks/bench_sign.py [次数]
+"""
+import os
+import re
+import sys
+import time
+import random
+import hashlib
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import signer  # noqa: E402
+
+NOCE = [3, 17, 42, 0, 61, 8, 25, 33, 50, 12, 7, 44, 19, 58, 2, 36, 29, 14, 40, 21]
+NOW_TIME = 1660000000
+
+# (请求体, 期望的m值)，期望值由签名组件重构前的实现生成
+GOLDEN = [
+    ({}, "b247dc1941aef48e4a196c73343451ab"),
+    ({"openId": "ooruxxxxxxxxxxxxxxxxxxxxxxl0", "unionId": "oHYxxxxxxxxxxxxxxxxxxxxxxQhE"},
+     "f3e5f38e63f8b70b0b22f26eb24d9e87"),
+    ({"username": "13400000000", "password": "e10adc3949ba59abbe56e057f20f883e"},
+     "6f5170bb11e0ef79eb98c037c077e11a"),
+    ({"traineeId": "123456"}, "05d02232b2a508c8227b0f76d9639aea"),
+    ({"traineeId": "123456", "adcode": 440305, "lat": 22.543096, "lng": 114.057865,
+      "address": "广东省深圳市南山区 科技园-A栋", "deviceName": "microsoft", "punchInStatus": 1,
+      "clockStatus": 2, "imgUrl": "", "reason": ""}, "5aafc0d5be87d2b2fdb1325fc75c5428"),
+    ({"address": "a <b> & c\tline\r\nnext", "remark": "含中文，标点", "note": "x-y z😀"},
+     "a488870c5cead86f02bf91db96fe24f9"),
+]
+
+
+def legacy_sign_header(data: dict, noce=None, now_time=None) -> dict:
+    """签名组件重构前XybAccount.sign_header的实现(去除日志)"""
+    re_punctuation = re.compile("[`~!@#$%^&*()+=|{}':;',\\[\\].<>/?~！@#￥%……&*（）——+|{}【】‘；：”“’。，、？]")
+    cookbook = ["5", "b", "f", "A", "J", "Q", "g", "a", "l", "p", "s", "q", "H", "4", "L", "Q", "g", "1", "6", "Q",
+                "Z", "v", "w", "b", "c", "e", "2", "2", "m", "l", "E", "g", "G", "H", "I", "r", "o", "s", "d", "5",
+                "7", "x", "t", "J", "S", "T", "F", "v", "w", "4", "8", "9", "0", "K", "E", "3", "4", "0", "m", "r",
+                "i", "n"]
+    except_key = ["content", "deviceName", "keyWord", "blogBody", "blogTitle", "getType", "responsibilities",
+                  "street", "text", "reason", "searchvalue", "key", "answers", "leaveReason", "personRemark",
+                  "selfAppraisal", "imgUrl", "wxname", "deviceId", "avatarTempPath", "file", "file", "model",
+                  "brand", "system", "deviceId", "platform"]
+    noce = noce if noce else [random.randint(0, len(cookbook) - 1) for _ in range(20)]
+    now_time = now_time if now_time else int(time.time())
+    sorted_data = dict(sorted(data.items(), key=lambda x: x[0]))
+
+    sign_str = ""
+    for k, v in sorted_data.items():
+        v = str(v)
+        if k not in except_key and not re.search(re_punctuation, v):
+            sign_str += str(v)
+    sign_str += str(now_time)
+    sign_str += "".join([cookbook[i] for i in noce])
+    sign_str = re.sub(r'\s+', "", sign_str)
+    sign_str = re.sub(r'\n+', "", sign_str)
+    sign_str = re.sub(r'\r+', "", sign_str)
+    sign_str = sign_str.replace("<", "")
+    sign_str = sign_str.replace(">", "")
+    sign_str = sign_str.replace("&", "")
+    sign_str = sign_str.replace("-", "")
+    sign_str = re.sub(f'\uD83C[\uDF00-\uDFFF]|\uD83D[\uDC00-\uDE4F]', "", sign_str)
+    sign_str = quote(sign_str)
+    sign = hashlib.md5(sign_str.encode('ascii'))
+
+    return {
+        "n": ",".join(except_key),
+        "t": str(now_time),
+        "s": "_".join([str(i) for i in noce]),
+        "m": sign.hexdigest(),
+        "v": "1.7.14"
+    }
+
+
+def check_golden():
+    for data, expected in GOLDEN:
+        legacy = legacy_sign_header(data, NOCE, NOW_TIME)
+        current = signer.sign(data, NOCE, NOW_TIME)
+        assert legacy["m"] == expected, f"旧版实现与签名向量不一致：{data}"
+        assert current == legacy, f"签名结果不一致：{data}"
+    batch = signer.sign_many([data for data, _ in GOLDEN], now_time=NOW_TIME)
+    assert [headers["t"] for headers in batch] == [str(NOW_TIME)] * len(GOLDEN)
+    print(f"签名向量校验通过：{len(GOLDEN)} 组")
+
+
+def bench(func, rounds: int) -> float:
+    payloads = [data for data, _ in GOLDEN]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data in payloads:
+            func(data)
+    return rounds * len(payloads) / (time.perf_counter() - start)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    check_golden()
+    before = bench(legacy_sign_header, rounds)
+    after = bench(signer.sign, rounds)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        signer.sign_many([data for data, _ in GOLDEN])
+    batch = rounds * len(GOLDEN) / (time.perf_counter() - start)
+    print(f"旧版实现：{before:,.0f} 次/秒")
+    print(f"signer.sign：{after:,.0f} 次/秒 ({after / before:.2f}x)")
+    print(f"signer.sign_many：{batch:,.0f} 次/秒 ({batch / before:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
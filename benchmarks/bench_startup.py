@@ -0,0 +1,134 @@
+"""
+冷启动压测
+
+在新进程中分别使用各传输实现，记录导入index的耗时(python -X importtime)与从进程启动到模拟服务器收到第一个请求的耗时，
+用于评估云函数冷启动的开销
+
+    python benchmarks/bench_startup.py [--repeat 5] [--top 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from statistics import median
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockServer  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BACKENDS = ("requests", "lite")
+
+CHILD = """
+import index
+index.main_handler({"TriggerName": "SignIn"}, {})
+"""
+
+
+def child_env(backend: str, base_url: str = None) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.abspath(ROOT)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    env["XYB_TRANSPORT"] = backend
+    env.pop("XYB_CACHE", None)
+    env.pop("XYB_JOURNAL", None)
+    env.pop("XYB_METRICS", None)
+    if base_url:
+        env["XYB_BASE_URL"] = base_url
+    return env
+
+
+def import_times(backend: str) -> dict:
+    """
+    导入index的耗时
+
+    :return: index及其导入的各模块的累计耗时(毫秒)
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import index"], env=child_env(backend),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    modules = dict()
+    children = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # 缩进表示导入层级，子模块先于父模块输出，仅统计index及其导入的模块
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth >= 1:
+            children[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == "index":
+                modules.update(children)
+                modules["index"] = int(cumulative) / 1000
+            children = dict()
+    return modules
+
+
+def first_request(backend: str, directory: str) -> float:
+    """
+    从启动进程到模拟服务器收到第一个请求的耗时
+
+    :return: 耗时(毫秒)
+    """
+    server = MockServer()
+    base_url = server.start()
+    try:
+        start = time.time()
+        subprocess.run([sys.executable, "-c", CHILD], cwd=directory, env=child_env(backend, base_url),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        return (server.state.first_request_at - start) * 1000
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动压测")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，结果取中位数")
+    parser.add_argument("--top", type=int, default=5, help="列出导入耗时最高的模块数量")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    with open(os.path.join(directory, "accounts.json"), "w", encoding="utf-8") as fp:
+        json.dump([{
+            "username": "13400000000",
+            "password": "password",
+            "location": {"adcode": 440305, "address": "广东省深圳市南山区", "lat": 0, "lng": 0}
+        }], fp, ensure_ascii=False)
+
+    rows = list()
+    try:
+        for backend in BACKENDS:
+            samples = [import_times(backend) for _ in range(args.repeat)]
+            modules = {name: median(sample.get(name, 0) for sample in samples) for name in samples[0]}
+            heavy = sorted((item for item in modules.items() if item[0] != "index"), key=lambda item: -item[1])
+            rows.append({
+                "backend": backend,
+                "import_ms": modules.get("index", 0),
+                "first_request_ms": median(first_request(backend, directory) for _ in range(args.repeat)),
+                "heaviest": heavy[:args.top]
+            })
+    finally:
+        os.remove(os.path.join(directory, "accounts.json"))
+        os.rmdir(directory)
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print(f"{'传输实现':<8} {'导入index(ms)':>14} {'首个请求(ms)':>13}")
+    for row in rows:
+        print(f"{row['backend']:<8} {row['import_ms']:>14.1f} {row['first_request_ms']:>13.1f}")
+    for row in rows:
+        print(f"\n{row['backend']} 导入耗时最高的模块：")
+        for name, cost in row["heaviest"]:
+            print(f"  {name:<24} {cost:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+账户状态的内存与快照基准测试
+
+分别测量每个账户占用的内存：原有的账户对象(属性保存在__dict__中，并持有独立的Session与日志)、
+当前的XybAccount(AccountState + 共用Session)以及单独的AccountState，并测量状态快照的保存与恢复耗时，
+不会发出任何网络请求
+
+    python benchmarks/bench_state_memory.py [数量]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import logs  # noqa: E402
+import requests  # noqa: E402
+import requests_transport  # noqa: E402
+import transport  # noqa: E402
+from xyb import XybAccount, XybSign  # noqa: E402
+from state import AccountState, dump_states, load_states  # noqa: E402
+
+SHARED_ADAPTER = requests_transport.SharedAdapter(pool_maxsize=transport.POOL_MAXSIZE)
+
+
+class LegacyAccount:
+    """原有XybAccount的内存结构：属性保存在__dict__中，每个账户持有独立的Session与日志"""
+
+    def __init__(self, **config):
+        self.logger = logs.get_logger("XybAccount")
+        self.train_init = False
+        self.train_loaded_at = 0.0
+        self.cache = None
+        self.reconcile = XybAccount.RECONCILE_RESPONSE
+        self.need_verify = False
+        self.request_count = 0
+        self.metrics = None
+        self.timings = dict()
+        self.session = requests.Session()
+        self.session.mount("https://", SHARED_ADAPTER)
+        self.session.mount("http://", SHARED_ADAPTER)
+        self.session.headers.update(XybSign.HEADERS)
+        self.open_id = config.get("openid")
+        self.union_id = config.get("unionid")
+        self.location = config.get("location")
+        self.account = config.get("username")
+        self.account_pass = config.get("password")
+        self.session_id = ""
+        self.loginer_id = ""
+        self.user_name = ""
+        self.phone = ""
+        self.train_id = ""
+        self.train_type = 0
+        self.post_state = 0
+        self.sign_lat = self.location.get("lat", 0)
+        self.sign_lng = self.location.get("lng", 0)
+        self.is_sign_in = False
+        self.is_sign_out = False
+        self.user_info_init = False
+
+
+def make_config(i: int) -> dict:
+    return {
+        "username": f"1340000{i:06d}",
+        "password": "password",
+        "location": {"adcode": 440305, "address": "广东省深圳市南山区", "lat": 0, "lng": 0}
+    }
+
+
+def fill(state):
+    """填充登录后的典型状态"""
+    state.session_id = f"{state.account}0123456789abcdef"
+    state.loginer_id = state.account[-8:]
+    state.user_name = "用户"
+    state.phone = state.account
+    state.train_id = f"T{state.account[-8:]}"
+    state.train_type = 1
+    state.post_state = 1
+    state.sign_lat = 22.543096
+    state.sign_lng = 114.057865
+    state.is_sign_in = True
+    return state
+
+
+def measure(factory, count: int) -> float:
+    """每个对象新增的内存(字节)，账户配置在测量前创建"""
+    configs = [make_config(i) for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [fill(factory(config)) for config in configs]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    logging.disable(logging.CRITICAL)
+    # 预先创建共用对象，不计入每个账户的内存
+    transport.shared_session(XybSign.HEADERS)
+    logs.get_logger("XybAccount")
+
+    rows = [
+        ("原有账户对象", measure(lambda config: LegacyAccount(**config), count)),
+        ("XybAccount", measure(lambda config: XybAccount(lazy=True, **config), count)),
+        ("AccountState", measure(AccountState.from_config, count)),
+    ]
+    print(f"账户数量：{count}")
+    for name, size in rows:
+        print(f"{name:<14} {size:>8.0f} 字节/账户  {size * count / 1024 / 1024:>8.1f} MB")
+
+    states = [fill(AccountState.from_config(make_config(i))) for i in range(count)]
+    fd, file = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        dump_states(states, file)
+        dump_time = time.perf_counter() - start
+        start = time.perf_counter()
+        restored = list(load_states(file))
+        load_time = time.perf_counter() - start
+        assert [state.to_list() for state in restored] == [state.to_list() for state in states]
+        print(f"快照：{os.path.getsize(file) / count:.0f} 字节/账户，保存 {dump_time * 1000:.1f} ms，"
+              f"恢复 {load_time * 1000:.1f} ms")
+    finally:
+        os.remove(file)
+
+
+if __name__ == '__main__':
+    main()
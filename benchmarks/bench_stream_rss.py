@@ -0,0 +1,101 @@
+"""
+流式执行的内存基准测试
+
+生成指定数量的虚拟账户配置，在子进程中对本地模拟服务器分别以一次性载入(持有全部XybAccount)与流式执行
+(逐个载入、登录、签到、回调并在完成后释放)完成一次完整的签到任务，测量子进程的峰值RSS
+
+    python benchmarks/bench_stream_rss.py [数量 ...]
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockServer  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SIZES = (1000, 10000, 100000)
+WORKERS = 8
+
+# 在子进程中执行，避免各次测量互相影响；模拟服务器运行在父进程中，不计入子进程的内存
+CHILD = """
+import sys, logging
+sys.path.insert(0, {root!r})
+logging.disable(logging.CRITICAL)
+import webhooks
+webhooks.on_sign_in = webhooks.on_sign_out = webhooks.on_batch_complete = lambda data: None
+from xyb import XybSign
+mode, file, base_url = sys.argv[1], sys.argv[2], sys.argv[3]
+count = 0
+if mode != "idle":
+    XybSign.set_base_url(base_url)
+    tools = XybSign(file, workers={workers}, lazy=True, streaming=mode == "stream")
+    report = tools.sign_in_all()
+    count = report["success"] + report["failure"]
+try:
+    # ru_maxrss会在exec时继承父进程的峰值，优先使用VmHWM
+    with open("/proc/self/status") as fp:
+        rss = next(int(line.split()[1]) for line in fp if line.startswith("VmHWM:"))
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(count, rss)
+"""
+
+
+def make_accounts(size: int) -> str:
+    """逐个写入虚拟账户配置，避免测量进程自身占用大量内存"""
+    fd, file = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as fp:
+        fp.write("[")
+        for i in range(size):
+            fp.write(",\n" if i else "\n")
+            json.dump({
+                "openid": "",
+                "unionid": "",
+                "username": f"1340000{i:06d}",
+                "password": "password",
+                "location": {"province": "", "country": "", "city": "", "adcode": 440305,
+                             "address": "广东省深圳市南山区", "lat": 22.543096, "lng": 114.057865}
+            }, fp, ensure_ascii=False)
+        fp.write("\n]")
+    return file
+
+
+def peak_rss(mode: str, file: str) -> float:
+    """子进程完成一次签到任务的峰值RSS(MB)"""
+    server = MockServer()
+    base_url = server.start()
+    try:
+        out = subprocess.check_output([sys.executable, "-c", CHILD.format(root=ROOT, workers=WORKERS), mode, file,
+                                       base_url])
+    finally:
+        server.stop()
+    count, rss = out.split()
+    # Linux下ru_maxrss的单位为KB，macOS为字节
+    return int(rss) / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    baseline = peak_rss("idle", os.devnull)
+    print(f"基准(仅导入)：{baseline:.1f} MB")
+    print(f"{'账户数':>8} {'一次性载入(MB)':>14} {'流式执行(MB)':>12} {'流式每账户增长(KB)':>16}")
+    previous = None
+    for size in sizes:
+        file = make_accounts(size)
+        try:
+            stream = peak_rss("stream", file)
+            # 相对上一个规模，每增加一个账户流式执行增加的峰值内存
+            growth = f"{(stream - previous[1]) * 1024 / (size - previous[0]):.3f}" if previous else "-"
+            print(f"{size:>8} {peak_rss('list', file):>14.1f} {stream:>12.1f} {growth:>16}")
+            previous = size, stream
+        finally:
+            os.remove(file)
+
+
+if __name__ == '__main__':
+    main()
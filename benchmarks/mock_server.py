@@ -0,0 +1,276 @@
+"""
+本地模拟校友邦服务器
+
+实现登录、用户信息、默认实习、实习详情与三种打卡接口，校验请求签名，并支持配置延迟、错误率与限流，
+用于在不访问真实服务器的情况下测试与压测
+
+    python benchmarks/mock_server.py [--port 8080] [--latency 20] [--error-rate 0.01] [--rate-limit 200]
+
+运行后可通过环境变量XYB_BASE_URL或XybSign.set_base_url将接口地址指向该服务器
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import socketserver
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import signer  # noqa: E402
+
+PATH_LOGIN_PHONE = "/login/login.action"
+PATH_LOGIN_WX = "/login/login!wx.action"
+PATH_ACCOUNT = "/account/LoadAccountInfo.action"
+PATH_TRAIN = "/student/clock/GetPlan!getDefault.action"
+PATH_TRAIN_INFO = "/student/clock/GetPlan!detail.action"
+PATH_AUTO_CLOCK = "/student/clock/Post!autoClock.action"
+PATH_NEW_CLOCK = "/student/clock/PostNew.action"
+PATH_UPDATE_CLOCK = "/student/clock/Post!updateClock.action"
+PATH_STATS = "/__stats"
+
+
+class MockState:
+    """模拟服务器的会话、考勤与统计数据"""
+
+    def __init__(self, latency: float = 0, jitter: float = 0, error_rate: float = 0, rate_limit: float = 0,
+                 post_state: int = 1):
+        """
+        :param latency: 每个请求的平均延迟(秒)
+        :param jitter: 延迟的随机波动(秒)
+        :param error_rate: 返回非JSON错误页面的概率
+        :param rate_limit: 每秒允许的请求数，超出时返回429，为0时不限流
+        :param post_state: 实习是否限制签到范围
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.post_state = post_state
+        self.lock = threading.Lock()
+        self.sessions = dict()  # sessionId -> loginerId
+        self.clocks = dict()  # loginerId -> {"inTime", "outTime"}
+        self.requests = Counter()
+        self.responses = Counter()
+        # 首个请求到达的时间(time.time())，用于测量客户端冷启动
+        self.first_request_at = None
+        self._tokens = rate_limit
+        self._refill = time.monotonic()
+
+    def throttled(self) -> bool:
+        """令牌桶限流"""
+        if not self.rate_limit:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refill) * self.rate_limit)
+            self._refill = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def record(self, counter: Counter, key: str):
+        with self.lock:
+            if self.first_request_at is None and counter is self.requests:
+                self.first_request_at = time.time()
+            counter[key] += 1
+
+    def login(self, name: str) -> dict:
+        loginer_id = str(int(hashlib.md5(name.encode("utf-8")).hexdigest()[:8], 16))
+        session_id = hashlib.md5(f"{name}{time.time()}{random.random()}".encode("utf-8")).hexdigest()
+        with self.lock:
+            self.sessions[session_id] = loginer_id
+            self.clocks.setdefault(loginer_id, {"inTime": "", "outTime": ""})
+        return {"loginerId": loginer_id, "sessionId": session_id, "phone": "13400000000"}
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "responses": dict(self.responses),
+                "total": sum(self.requests.values())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.sessions.clear()
+            self.clocks.clear()
+            self.requests.clear()
+            self.responses.clear()
+            self.first_request_at = None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体一次写出，避免延迟确认带来的额外延迟
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    state = None  # type: MockState
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type="application/json;charset=UTF-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or dict()).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, code: str, data=None, msg="", headers=None):
+        self.state.record(self.state.responses, code)
+        self._send(200, json.dumps({"code": code, "msg": msg, "data": data}, ensure_ascii=False).encode("utf-8"),
+                   headers=headers)
+
+    def _verify_sign(self, data: dict) -> bool:
+        try:
+            noce = [int(i) for i in self.headers["s"].split("_")]
+            expected = signer.sign(data, noce, int(self.headers["t"]))
+        except (AttributeError, KeyError, TypeError, ValueError, IndexError):
+            return False
+        return expected["m"] == self.headers["m"]
+
+    def _loginer(self):
+        cookies = self.headers.get("Cookie", "")
+        for item in cookies.split(";"):
+            key, _, value = item.strip().partition("=")
+            if key == "JSESSIONID":
+                return self.state.sessions.get(value)
+        return None
+
+    def _handle(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        if path == PATH_STATS:
+            self._send(200, json.dumps(self.state.stats()).encode("utf-8"))
+            return
+        self.state.record(self.state.requests, path)
+        if self.state.latency or self.state.jitter:
+            time.sleep(max(0.0, random.gauss(self.state.latency, self.state.jitter)))
+        if self.state.throttled():
+            self.state.record(self.state.responses, "429")
+            self._send(429, "请求过于频繁".encode("utf-8"), "text/plain;charset=UTF-8")
+            return
+        if random.random() < self.state.error_rate:
+            self.state.record(self.state.responses, "502")
+            self._send(502, b"<html><body>502 Bad Gateway</body></html>", "text/html")
+            return
+        data = {key: values[0] for key, values in parse_qs(body, keep_blank_values=True).items()}
+        if not self._verify_sign(data):
+            self._json("403", msg="签名错误")
+            return
+
+        if path in (PATH_LOGIN_PHONE, PATH_LOGIN_WX):
+            name = data.get("username") or data.get("openId")
+            if not name:
+                self._json("202", msg="账号或密码错误")
+                return
+            info = self.state.login(name)
+            self._json("200", info, headers={"Set-Cookie": f"JSESSIONID={info['sessionId']}; Path=/"})
+            return
+        loginer_id = self._loginer()
+        if loginer_id is None:
+            self._json("202", msg="请重新登录")
+            return
+        clock = self.state.clocks[loginer_id]
+        if path == PATH_ACCOUNT:
+            self._json("200", {"loginer": f"用户{loginer_id[-4:]}", "loginerId": loginer_id})
+        elif path == PATH_TRAIN:
+            self._json("200", {"clockVo": {"traineeId": f"T{loginer_id}", "planName": "模拟实习",
+                                           "startDate": "2026-01-01", "endDate": "2026-12-31"}})
+        elif path == PATH_TRAIN_INFO:
+            self._json("200", {
+                "clockRuleType": 1,
+                "postInfo": {"state": self.state.post_state, "lat": 22.543096, "lng": 114.057865},
+                "clockInfo": dict(clock)
+            })
+        elif path in (PATH_AUTO_CLOCK, PATH_NEW_CLOCK, PATH_UPDATE_CLOCK):
+            now = time.strftime("%Y-%m-%d %H:%M:%S")
+            field = "inTime" if data.get("clockStatus") == "2" else "outTime"
+            if path == PATH_AUTO_CLOCK and clock[field]:
+                self._json("200", msg="已打卡")
+                return
+            if path == PATH_UPDATE_CLOCK and not clock[field]:
+                self._json("202", msg="没有可以更新的记录")
+                return
+            with self.state.lock:
+                clock[field] = now
+            self._json("200")
+        else:
+            self.state.record(self.state.responses, "404")
+            self._send(404, b"Not Found", "text/plain")
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class MockServer:
+    """在后台线程中运行的模拟服务器"""
+
+    def __init__(self, host="127.0.0.1", port=0, **options):
+        """
+        :param host: 监听地址
+        :param port: 监听端口，为0时随机分配
+        :param options: MockState的参数
+        """
+        self.state = MockState(**options)
+        handler = type("Handler", (MockHandler,), {"state": self.state})
+        self.server = ThreadingServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """启动服务器并返回接口地址"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> dict:
+        return self.state.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟校友邦服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="平均延迟(毫秒)")
+    parser.add_argument("--jitter", type=float, default=0, help="延迟波动(毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0, help="返回错误页面的概率")
+    parser.add_argument("--rate-limit", type=float, default=0, help="每秒允许的请求数")
+    args = parser.parse_args()
+    server = MockServer(args.host, args.port, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                        error_rate=args.error_rate, rate_limit=args.rate_limit)
+    print(f"模拟服务器运行于 {server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
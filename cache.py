@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import threading
+from typing import Optional
+
+
+class SessionCache:
+    """
+    账户会话缓存
+
+    以JSON文件保存各账户登录后的会话与实习信息，在有效期内可以跳过登录流程
+    """
+
+    def __init__(self, file="session_cache.json", ttl: int = 86400):
+        """
+        :param file: 缓存文件路径，云函数中需要位于可写目录(如/tmp)
+        :param ttl: 缓存有效期(秒)
+        """
+        self.file = file
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._data = dict()
+        try:
+            with open(file, encoding="utf-8") as fp:
+                self._data = json.load(fp)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        获得账户缓存，不存在或已过期时返回None
+
+        :param key: 账户标识
+        :return: 缓存数据
+        """
+        if not key:
+            return None
+        with self._lock:
+            item = self._data.get(key)
+            if item and item.get("expires", 0) > time.time():
+                return item["data"]
+        return None
+
+    def set(self, key: str, data: dict):
+        """
+        写入账户缓存
+
+        :param key: 账户标识
+        :param data: 缓存数据
+        """
+        if not key:
+            return
+        with self._lock:
+            self._data[key] = {
+                "expires": time.time() + self.ttl,
+                "data": data
+            }
+            self._dirty = True
+
+    def invalidate(self, key: str):
+        """
+        使账户缓存失效
+
+        :param key: 账户标识
+        """
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """将缓存写入文件，并清理已过期的条目"""
+        with self._lock:
+            now = time.time()
+            expired = [key for key, item in self._data.items() if item.get("expires", 0) <= now]
+            for key in expired:
+                del self._data[key]
+            if not (self._dirty or expired):
+                return
+            tmp_file = f"{self.file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as fp:
+                json.dump(self._data, fp, ensure_ascii=False)
+            os.replace(tmp_file, self.file)
+            self._dirty = False
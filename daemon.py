@@ -0,0 +1,143 @@
+"""
+常驻运行
+
+在进程内按每天的签到/签退时间执行批量任务，账户会话在两次任务之间保持，仅在会话失效时重新登录；
+每个账户的打卡时间在分散时间内随机错开，避免大量账户在同一时刻请求服务器
+
+    python daemon.py [--sign-in 08:00] [--sign-out 18:00] [--spread 600] [--workers 8] [--file accounts.json]
+"""
+import signal
+import argparse
+import datetime
+import threading
+from typing import List, Tuple
+
+import logs
+from xyb import XybSign
+from cache import SessionCache
+
+
+def parse_clock(clock: str) -> datetime.time:
+    """
+    解析每天的执行时间
+
+    :param clock: 时间，格式为HH:MM或HH:MM:SS
+    :return: 时间
+    """
+    parts = [int(part) for part in clock.split(":")]
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"执行时间格式不正确：{clock}")
+    return datetime.time(*parts)
+
+
+class XybDaemon:
+    """
+    常驻运行的签到服务
+
+    账户只在首次任务时登录，之后的任务前仅刷新考勤状态，会话失效时自动重新登录
+    """
+
+    def __init__(self, tools: XybSign, sign_in: str = "08:00", sign_out: str = "18:00", spread: float = 0,
+                 overwrite: bool = False, prescan: bool = False):
+        """
+        :param tools: 批量任务，不支持流式执行
+        :param sign_in: 每天的签到时间，为空时不签到
+        :param sign_out: 每天的签退时间，为空时不签退
+        :param spread: 分散时间(秒)，各账户在执行时间之后的该时间内随机打卡
+        :param overwrite: 已经签到/签退时是否覆盖
+        :param prescan: 预扫描，任务前并发拉取全部账户的考勤状态，无需打卡的账户不参与分散时间
+        """
+        if tools.streaming:
+            raise ValueError("常驻运行需要保持账户会话，不支持流式执行")
+        self.tools = tools
+        self.spread = spread
+        self.overwrite = overwrite
+        self.prescan = prescan
+        self.schedule = list()  # type: List[Tuple[datetime.time, bool]]
+        for clock, sign_type in ((sign_in, True), (sign_out, False)):
+            if clock:
+                self.schedule.append((parse_clock(clock), sign_type))
+        if not self.schedule:
+            raise ValueError("至少需要配置签到或签退时间")
+        self.logger = logs.get_logger("XybDaemon")
+        self._stop = threading.Event()
+
+    def next_run(self, now: datetime.datetime = None) -> Tuple[datetime.datetime, bool]:
+        """
+        获得下一次任务
+
+        :param now: 当前时间
+        :return: 执行时间与签到/签出类型
+        """
+        now = now or datetime.datetime.now()
+        runs = list()
+        for clock, sign_type in self.schedule:
+            run_at = datetime.datetime.combine(now.date(), clock)
+            if run_at <= now:
+                run_at += datetime.timedelta(days=1)
+            runs.append((run_at, sign_type))
+        return min(runs, key=lambda run: run[0])
+
+    def run_once(self, sign_type: bool) -> dict:
+        """
+        立即执行一次批量任务
+
+        :param sign_type: 签到/签出类型
+        :return: 任务报告
+        """
+        if sign_type:
+            return self.tools.sign_in_all(self.overwrite, spread=self.spread, prescan=self.prescan)
+        return self.tools.sign_out_all(self.overwrite, spread=self.spread, prescan=self.prescan)
+
+    def run_forever(self):
+        """按计划循环执行，直到调用stop"""
+        while not self._stop.is_set():
+            run_at, sign_type = self.next_run()
+            self.logger.info("下一次%s：%s", "签到" if sign_type else "签退", run_at.strftime("%Y-%m-%d %H:%M:%S"))
+            # 按墙上时间等待，系统休眠或校时后仍在计划时间执行
+            while not self._stop.is_set():
+                remaining = (run_at - datetime.datetime.now()).total_seconds()
+                if remaining <= 0:
+                    break
+                self._stop.wait(min(remaining, 60))
+            if self._stop.is_set():
+                break
+            try:
+                self.run_once(sign_type)
+            except Exception as err:
+                self.logger.error("批量任务出现异常")
+                self.logger.exception(err)
+        self.logger.info("常驻运行已停止")
+        logs.flush()
+
+    def stop(self):
+        """停止运行，正在执行的批量任务会继续完成"""
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻运行")
+    parser.add_argument("--file", default="accounts.json", help="账户配置文件")
+    parser.add_argument("--sign-in", default="08:00", help="每天的签到时间，为空时不签到")
+    parser.add_argument("--sign-out", default="18:00", help="每天的签退时间，为空时不签退")
+    parser.add_argument("--spread", type=float, default=600, help="分散时间(秒)")
+    parser.add_argument("--workers", type=int, default=4, help="并发数")
+    parser.add_argument("--cache", help="会话缓存文件，重启后可以恢复会话")
+    parser.add_argument("--metrics", help="运行指标的导出路径前缀")
+    parser.add_argument("--history", help="历史记录数据库文件")
+    parser.add_argument("--profile", action="store_true", help="每次批量任务输出性能分析报告")
+    parser.add_argument("--prescan", action="store_true", help="任务前预扫描考勤状态，仅对需要打卡的账户执行打卡")
+    parser.add_argument("--overwrite", action="store_true", help="已经签到/签退时覆盖")
+    args = parser.parse_args()
+
+    tools = XybSign(args.file, workers=args.workers, lazy=True, cache=SessionCache(args.cache) if args.cache else None,
+                    metrics_file=args.metrics, history=args.history, profile=args.profile)
+    daemon = XybDaemon(tools, args.sign_in, args.sign_out, spread=args.spread, overwrite=args.overwrite,
+                       prescan=args.prescan)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+    daemon.run_forever()
+
+
+if __name__ == '__main__':
+    main()
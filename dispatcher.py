@@ -0,0 +1,148 @@
+import time
+import threading
+from typing import Callable, Optional, Set
+from collections import Counter
+from concurrent import futures
+
+import logs
+from metrics import Metrics
+
+
+class WebhookDispatcher:
+    """
+    Webhooks回调分发
+
+    每个账户完成后即可提交回调，回调在后台线程中并发执行，单次调用超时后不再等待，出现异常时按退避时间重试；
+    超时后仍未返回的回调在所有分发之间共同计数，达到上限时不再开始新的回调，避免常驻运行时线程不断累积；
+    批量任务结束后，可将全部回调数据一次性交给批量回调on_batch_complete
+    """
+    # 超时后仍在执行的回调线程，由所有分发共用
+    _hung = set()  # type: Set[threading.Thread]
+    _hung_lock = threading.Lock()
+
+    def __init__(self, sign_type: bool, workers: int = 4, timeout: float = 10, retries: int = 1,
+                 backoff: float = 0.5, logger: logs.ContextLogger = None, metrics: Metrics = None):
+        """
+        :param sign_type: 签到/签出类型
+        :param workers: 回调并发数
+        :param timeout: 单次回调超时时间(秒)
+        :param retries: 回调出现异常时的重试次数
+        :param backoff: 首次重试前的等待时间(秒)，之后每次翻倍
+        :param logger: 日志
+        :param metrics: 运行指标，记录回调的耗时与结果
+        """
+        # 用户的webhooks模块可能导入较多依赖，在需要回调时再导入
+        import webhooks
+        self.hook = webhooks.on_sign_in if sign_type else webhooks.on_sign_out
+        self.batch_hook = getattr(webhooks, "on_batch_complete", None)  # type: Optional[Callable]
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.logger = logger or logs.get_logger("WebhookDispatcher")
+        self.metrics = metrics
+        # 仅保留完成/失败计数，不保留各回调的Future，内存占用不随回调数量增长
+        self._counter = Counter()
+        self._counter_lock = threading.Lock()
+        workers = max(1, int(workers))
+        # 超时后仍未返回的回调上限，达到上限时新的回调直接计为失败
+        self.max_hung = workers
+        # 调度线程负责等待与重试，每次回调在单独的守护线程中执行，超时的回调不会阻塞调度
+        self._runner = futures.ThreadPoolExecutor(max_workers=workers)
+
+    def _call(self, hook: Callable, data) -> bool:
+        """
+        在新的守护线程中执行回调，超时时间从回调开始执行时计算；超时的线程不再等待，也不会阻止进程退出
+
+        :param hook: 回调函数
+        :param data: 回调数据
+        :return: 回调是否在超时前返回
+        :raises Exception: 回调抛出的异常
+        """
+        outcome = dict()
+
+        def target():
+            try:
+                hook(data)
+            except Exception as err:
+                outcome["error"] = err
+
+        caller = threading.Thread(target=target, name=f"Webhook-{getattr(hook, '__name__', 'hook')}", daemon=True)
+        caller.start()
+        caller.join(self.timeout)
+        if caller.is_alive():
+            with WebhookDispatcher._hung_lock:
+                WebhookDispatcher._hung.add(caller)
+            return False
+        if "error" in outcome:
+            raise outcome["error"]
+        return True
+
+    def _saturated(self) -> bool:
+        """超时后仍未返回的回调是否已达上限，清理已经结束的回调线程"""
+        with WebhookDispatcher._hung_lock:
+            WebhookDispatcher._hung = {caller for caller in WebhookDispatcher._hung if caller.is_alive()}
+            return len(WebhookDispatcher._hung) >= self.max_hung
+
+    def _deliver(self, hook: Callable, data) -> bool:
+        """
+        执行回调，出现异常时重试；超时后仍未返回的回调达到上限时不再执行
+
+        :param hook: 回调函数
+        :param data: 回调数据
+        :return: 回调是否完成
+        """
+        for attempt in range(self.retries + 1):
+            if self._saturated():
+                self._record(hook, time.perf_counter(), "skipped")
+                self.logger.error("超时未返回的Webhook过多，跳过回调：%s", hook.__name__)
+                return False
+            start = time.perf_counter()
+            try:
+                if not self._call(hook, data):
+                    self._record(hook, start, "timeout")
+                    self.logger.error("调用Webhook超时(%ss)：%s", self.timeout, hook.__name__)
+                    return False
+                self._record(hook, start, "ok")
+                return True
+            except Exception as err:
+                self._record(hook, start, "error")
+                self.logger.error("调用Webhook时出现异常：%s", hook.__name__)
+                self.logger.exception(err)
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        return False
+
+    def _record(self, hook: Callable, start: float, result: str):
+        if self.metrics:
+            name = getattr(hook, "__name__", "hook")
+            self.metrics.observe("xyb_webhook_duration_seconds", time.perf_counter() - start, hook=name)
+            self.metrics.inc("xyb_webhook_results_total", hook=name, result=result)
+
+    def submit(self, data: dict):
+        """
+        提交单个账户的回调，立即返回
+
+        :param data: 回调数据
+        """
+        self._runner.submit(self._deliver, self.hook, data).add_done_callback(self._count)
+
+    def _count(self, future: futures.Future):
+        result = not future.cancelled() and future.exception() is None and future.result()
+        with self._counter_lock:
+            self._counter.update((bool(result),))
+
+    def close(self, batch: list = None) -> Counter:
+        """
+        等待全部回调完成，并执行批量回调
+
+        :param batch: 批量回调数据，为None时不执行批量回调
+        :return: 单个账户回调的完成/失败计数
+        """
+        self._runner.shutdown(wait=True)
+        with self._counter_lock:
+            counter = Counter(self._counter)
+        self.logger.info(f"Webhooks: {sum(counter.values())} || {counter[True]}(完成) / {counter[False]}(失败)")
+        if batch is not None and self.batch_hook:
+            result = self._deliver(self.batch_hook, batch)
+            self.logger.info(f"批量Webhook: {len(batch)} 条数据 || {'完成' if result else '失败'}")
+        return counter
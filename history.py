@@ -0,0 +1,349 @@
+"""
+考勤历史记录
+
+以SQLite保存每次批量任务中各账户的结果、考勤状态、接口耗时与服务器返回的错误信息，按日期、账户与结果建立索引
+
+    python history.py [--db history.db] [--days 7] [--sign-out] [--failed] [--account 13400000000] [--summary]
+"""
+import json
+import time
+import queue
+import sqlite3
+import argparse
+import datetime
+import threading
+from typing import Dict, List, Optional
+
+import logs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    sign_type INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    success INTEGER,
+    failure INTEGER,
+    requests INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    time REAL NOT NULL,
+    sign_type INTEGER NOT NULL,
+    account TEXT NOT NULL,
+    username TEXT,
+    openid TEXT,
+    loginer_id TEXT,
+    name TEXT,
+    result INTEGER NOT NULL,
+    is_sign_in INTEGER,
+    is_sign_out INTEGER,
+    requests INTEGER,
+    timings TEXT,
+    error TEXT,
+    webhook TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_date ON results (date, sign_type);
+CREATE INDEX IF NOT EXISTS idx_results_account ON results (account, date);
+CREATE INDEX IF NOT EXISTS idx_results_result ON results (result, date);
+"""
+
+COLUMNS = ("run_id", "date", "time", "sign_type", "account", "username", "openid", "loginer_id", "name", "result",
+           "is_sign_in", "is_sign_out", "requests", "timings", "error", "webhook")
+INSERT = f"INSERT INTO results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+class CompletedAccounts:
+    """
+    当天已成功的账户，提供与RunJournal一致的查询接口，用于在批量任务中跳过这些账户
+
+    账户结果由批量任务统一写入历史记录，record不做任何操作
+    """
+
+    def __init__(self, entries: Dict[str, dict]):
+        """
+        :param entries: 手机号或OpenID到回调数据的映射
+        """
+        self._entries = entries
+        self._count = len({id(entry) for entry in entries.values()})
+
+    def count(self) -> int:
+        return self._count
+
+    def completed(self, key: str) -> Optional[dict]:
+        return self._entries.get(key) if key else None
+
+    def record(self, key: str, result: bool, webhook_data: dict):
+        pass
+
+    def close(self):
+        pass
+
+
+class HistoryStore:
+    """
+    考勤历史记录
+
+    账户结果先放入队列，由后台线程按批写入，不阻塞批量任务；查询前会等待已提交的结果写入完成
+    """
+
+    def __init__(self, file="history.db", batch_size: int = 200, interval: float = 1.0):
+        """
+        :param file: 数据库文件，云函数中需要位于可写目录(如/tmp)
+        :param batch_size: 单次写入的最大结果数
+        :param interval: 未凑满一批时的最长等待时间(秒)
+        """
+        self.file = file
+        self.batch_size = max(1, int(batch_size))
+        self.interval = interval
+        self.logger = logs.get_logger("HistoryStore")
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None  # type: Optional[threading.Thread]
+        # 结果的日期与所属任务保持一致，跨零点的任务不会被拆分到两天
+        self._run_dates = dict()  # type: Dict[int, str]
+        self._conn = sqlite3.connect(file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def start_run(self, sign_type: bool, date: str = None) -> int:
+        """
+        开始记录一次批量任务
+
+        :param sign_type: 签到/签出类型
+        :param date: 日期，默认为当天，格式为%Y-%m-%d
+        :return: 任务ID
+        """
+        date = date or time.strftime("%Y-%m-%d")
+        with self._lock, self._conn:
+            cursor = self._conn.execute("INSERT INTO runs (date, sign_type, started_at) VALUES (?, ?, ?)",
+                                        (date, int(sign_type), time.time()))
+            self._run_dates[cursor.lastrowid] = date
+            return cursor.lastrowid
+
+    def finish_run(self, run_id: int, success: int, failure: int, requests: int):
+        """
+        结束批量任务，等待该任务的账户结果全部写入
+
+        :param run_id: 任务ID
+        :param success: 成功账户数
+        :param failure: 失败账户数
+        :param requests: 请求数
+        """
+        self.flush()
+        with self._lock, self._conn:
+            self._run_dates.pop(run_id, None)
+            self._conn.execute("UPDATE runs SET finished_at = ?, success = ?, failure = ?, requests = ? WHERE id = ?",
+                               (time.time(), success, failure, requests, run_id))
+
+    def record(self, run_id: int, webhook_data: dict, requests: int = 0):
+        """
+        提交单个账户的结果，由后台线程写入
+
+        :param run_id: 任务ID
+        :param webhook_data: 回调数据
+        :param requests: 该账户在本次任务中的请求数
+        """
+        error = webhook_data.get("error")
+        date = self._run_dates.get(run_id) or time.strftime("%Y-%m-%d")
+        self._queue.put((
+            run_id, date, time.time(), int(webhook_data["sign_type"]),
+            webhook_data.get("username") or webhook_data.get("openid") or "",
+            webhook_data.get("username"), webhook_data.get("openid"), webhook_data.get("loginer_id"),
+            webhook_data.get("name"), int(bool(webhook_data["result"])), int(bool(webhook_data.get("is_sign_in"))),
+            int(bool(webhook_data.get("is_sign_out"))), requests,
+            json.dumps(webhook_data.get("timings") or {}),
+            json.dumps(error, ensure_ascii=False) if error else None,
+            json.dumps(webhook_data, ensure_ascii=False)
+        ))
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="HistoryWriter", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = list()
+            item = self._queue.get()
+            deadline = time.monotonic() + self.interval
+            # None表示需要立即写入，由flush提交
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            else:
+                self._queue.task_done()
+            try:
+                if batch:
+                    self._write(batch)
+            except sqlite3.Error as err:
+                self.logger.warning(f"历史记录写入失败，丢弃 {len(batch)} 条结果：{err}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: list):
+        with self._lock, self._conn:
+            self._conn.executemany(INSERT, batch)
+
+    def flush(self):
+        """等待已提交的结果写入完成"""
+        if self._writer is not None:
+            self._queue.put(None)
+        self._queue.join()
+
+    def completed(self, sign_type: bool, date: str = None) -> CompletedAccounts:
+        """
+        获得当天已成功的账户，以各账户当天最后一次的结果为准
+
+        :param sign_type: 签到/签出类型
+        :param date: 日期，默认为当天
+        :return: 已成功的账户
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT account, result, webhook FROM results WHERE date = ? AND sign_type = ? ORDER BY id",
+                (date or time.strftime("%Y-%m-%d"), int(sign_type))).fetchall()
+        latest = {row["account"]: row for row in rows}
+        entries = dict()
+        for row in latest.values():
+            if not row["result"]:
+                continue
+            webhook_data = json.loads(row["webhook"])
+            for key in (webhook_data.get("username"), webhook_data.get("openid")):
+                if key:
+                    entries[key] = webhook_data
+        return CompletedAccounts(entries)
+
+    def query(self, since: str = None, until: str = None, account: str = None, result: bool = None,
+              sign_type: bool = None, limit: int = 100) -> List[dict]:
+        """
+        查询账户结果，按时间倒序
+
+        :param since: 起始日期(包含)
+        :param until: 结束日期(包含)
+        :param account: 手机号、OpenID或loginer_id
+        :param result: 任务结果
+        :param sign_type: 签到/签出类型
+        :param limit: 最大条数
+        :return: 账户结果
+        """
+        self.flush()
+        conditions, params = list(), list()
+        if since:
+            conditions.append("date >= ?")
+            params.append(since)
+        if until:
+            conditions.append("date <= ?")
+            params.append(until)
+        if account:
+            conditions.append("(account = ? OR loginer_id = ?)")
+            params.extend((account, account))
+        if result is not None:
+            conditions.append("result = ?")
+            params.append(int(result))
+        if sign_type is not None:
+            conditions.append("sign_type = ?")
+            params.append(int(sign_type))
+        sql = "SELECT * FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        records = list()
+        for row in rows:
+            record = {column: row[column] for column in row.keys() if column != "webhook"}
+            for column in ("sign_type", "result", "is_sign_in", "is_sign_out"):
+                record[column] = bool(record[column])
+            record["timings"] = json.loads(record["timings"] or "{}")
+            record["error"] = json.loads(record["error"]) if record["error"] else None
+            records.append(record)
+        return records
+
+    def summary(self, since: str = None, until: str = None) -> List[dict]:
+        """
+        按日期与签到/签出类型汇总成功与失败的账户数，以各账户当天最后一次的结果为准
+
+        :param since: 起始日期(包含)
+        :param until: 结束日期(包含)
+        :return: 汇总结果，按日期倒序
+        """
+        self.flush()
+        sql = ("SELECT date, sign_type, SUM(result) AS success, COUNT(*) - SUM(result) AS failure FROM results "
+               "WHERE id IN (SELECT MAX(id) FROM results WHERE date >= ? AND date <= ? "
+               "GROUP BY date, sign_type, account) GROUP BY date, sign_type ORDER BY date DESC, sign_type DESC")
+        with self._lock:
+            rows = self._conn.execute(sql, (since or "", until or "9999-12-31")).fetchall()
+        return [{"date": row["date"], "sign_type": bool(row["sign_type"]), "success": row["success"],
+                 "failure": row["failure"]} for row in rows]
+
+    def close(self):
+        """等待写入完成并关闭数据库"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询考勤历史记录")
+    parser.add_argument("--db", default="history.db", help="数据库文件")
+    parser.add_argument("--since", help="起始日期，格式为YYYY-MM-DD")
+    parser.add_argument("--until", help="结束日期，格式为YYYY-MM-DD")
+    parser.add_argument("--days", type=int, help="最近的天数(包括今天)，指定时忽略--since")
+    parser.add_argument("--account", help="手机号、OpenID或loginer_id")
+    parser.add_argument("--sign-in", dest="sign_type", action="store_const", const=True, help="仅查询签到")
+    parser.add_argument("--sign-out", dest="sign_type", action="store_const", const=False, help="仅查询签退")
+    parser.add_argument("--failed", dest="result", action="store_const", const=False, help="仅查询失败的结果")
+    parser.add_argument("--success", dest="result", action="store_const", const=True, help="仅查询成功的结果")
+    parser.add_argument("--limit", type=int, default=100, help="最大条数")
+    parser.add_argument("--summary", action="store_true", help="按日期汇总成功与失败的账户数")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    since = args.since
+    if args.days:
+        since = (datetime.date.today() - datetime.timedelta(days=args.days - 1)).isoformat()
+    store = HistoryStore(args.db)
+    try:
+        if args.summary:
+            rows = store.summary(since, args.until)
+        else:
+            rows = store.query(since, args.until, account=args.account, result=args.result,
+                               sign_type=args.sign_type, limit=args.limit)
+    finally:
+        store.close()
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    if args.summary:
+        print(f"{'日期':<10} {'类型':<4} {'成功':>6} {'失败':>6}")
+        for row in rows:
+            print(f"{row['date']:<10} {'签到' if row['sign_type'] else '签退':<4} {row['success']:>6} "
+                  f"{row['failure']:>6}")
+        return
+    for row in rows:
+        when = datetime.datetime.fromtimestamp(row["time"]).strftime("%Y-%m-%d %H:%M:%S")
+        error = row["error"]["message"] if row["error"] else ""
+        print(f"{when} {'签到' if row['sign_type'] else '签退'} {'成功' if row['result'] else '失败'} "
+              f"{row['account']} {row['name'] or ''} 请求 {row['requests']} 次 {error}".rstrip())
+
+
+if __name__ == '__main__':
+    main()
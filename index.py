@@ -1,12 +1,45 @@
 # Tencent cloud SCF function
 
-from xyb import XybSign
+import os
+
+import logs
+from xyb import XybSign, XybAccount, Deadline
+from cache import SessionCache
 
 
 def main_handler(event, context):
+    deadline = Deadline.from_context(context)
     sign_type = ("SignOut", "SignIn")
     if "TriggerName" in event and event["TriggerName"] in sign_type:
-        tools = XybSign()
-        tools.sign_in_all(True) if sign_type.index(event["TriggerName"]) else tools.sign_out_all(True)
+        cache_file = os.environ.get("XYB_CACHE")
+        shard = event.get("Shard")
+        message = event.get("Message")
+        if shard or message:
+            # 分片模块仅在指定分片时导入，减少冷启动耗时
+            from shard import parse_shard
+            if shard:
+                shard = parse_shard(shard)
+            else:
+                # 定时触发器的附加信息可能另有用途，不是分片参数时忽略
+                try:
+                    shard = parse_shard(message)
+                except ValueError as err:
+                    logs.get_logger("index").warning(f"附加信息不是分片参数，已忽略：{err}")
+                    shard = None
+        tools = XybSign(workers=int(os.environ.get("XYB_WORKERS", 1)), lazy=os.environ.get("XYB_LAZY") == "1",
+                        cache=SessionCache(cache_file) if cache_file else None,
+                        reconcile=os.environ.get("XYB_RECONCILE", XybAccount.RECONCILE_RESPONSE),
+                        shard=shard,
+                        metrics_file=os.environ.get("XYB_METRICS"), journal=os.environ.get("XYB_JOURNAL"),
+                        adaptive=os.environ.get("XYB_ADAPTIVE") == "1", history=os.environ.get("XYB_HISTORY"),
+                        profile=bool(event.get("Profile")) or os.environ.get("XYB_PROFILE") == "1")
+        if event.get("DryRun"):
+            # 演练：仅输出打卡计划，不进行打卡与回调
+            return tools.prescan(bool(sign_type.index(event["TriggerName"])), True, deadline=deadline)
+        prescan = os.environ.get("XYB_PRESCAN") == "1"
+        if sign_type.index(event["TriggerName"]):
+            return tools.sign_in_all(True, deadline=deadline, prescan=prescan)
+        else:
+            return tools.sign_out_all(True, deadline=deadline, prescan=prescan)
     else:
         raise RuntimeError("触发器配置不正确，请参考配置说明")
@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import threading
+from typing import Optional
+
+
+class RunJournal:
+    """
+    批量任务日志
+
+    按日期与签到/签退类型，将各账户的任务结果逐条追加到JSON Lines文件中，每条记录写入后立即落盘；
+    同一天再次执行同类型的任务时，已经成功的账户可以直接跳过，无需任何网络请求
+    """
+
+    def __init__(self, directory="journal", sign_type: bool = True, date: str = None):
+        """
+        :param directory: 日志目录，云函数中需要位于可写目录(如/tmp)
+        :param sign_type: 签到/签出类型
+        :param date: 日期，默认为当天，格式为%Y-%m-%d
+        """
+        date = date or time.strftime("%Y-%m-%d")
+        self.file = os.path.join(directory, f"{date}-{'sign_in' if sign_type else 'sign_out'}.jsonl")
+        self._lock = threading.Lock()
+        self._fp = None
+        self._entries = dict()
+        try:
+            with open(self.file, encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 中断时可能留下不完整的最后一行
+                        continue
+                    self._entries[entry["key"]] = entry
+        except OSError:
+            pass
+
+    def count(self) -> int:
+        """已成功的账户数"""
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry["result"])
+
+    def completed(self, key: str) -> Optional[dict]:
+        """
+        获得已成功账户的回调数据，未执行或未成功时返回None
+
+        :param key: 账户标识
+        :return: 回调数据
+        """
+        if not key:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry["result"]:
+            return entry["webhook"]
+        return None
+
+    def record(self, key: str, result: bool, webhook_data: dict):
+        """
+        追加一条账户任务结果
+
+        :param key: 账户标识
+        :param result: 任务结果
+        :param webhook_data: 回调数据
+        """
+        if not key:
+            return
+        entry = {"key": key, "result": result, "time": int(time.time()), "webhook": webhook_data}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._fp is None:
+                os.makedirs(os.path.dirname(self.file) or ".", exist_ok=True)
+                self._fp = open(self.file, "a", encoding="utf-8")
+            self._fp.write(line)
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+            self._entries[key] = entry
+
+    def close(self):
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
@@ -0,0 +1,271 @@
+"""
+基于标准库http.client的轻量传输实现
+
+仅实现XybAccount所需的接口：表单POST、GET、Cookies与超时，不处理重定向与代理，导入耗时远低于requests
+"""
+import json
+import zlib
+import select
+import socket
+import threading
+import http.client
+from typing import Optional
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, urlencode
+
+
+class RequestException(IOError):
+    """请求异常"""
+
+
+class ConnectionError(RequestException):  # noqa: A001
+    """连接异常，not_sent为True时请求确认未发出"""
+
+    def __init__(self, *args, not_sent: bool = False):
+        super().__init__(*args)
+        self.not_sent = not_sent
+
+
+class Timeout(RequestException):
+    """请求超时"""
+
+
+class ConnectTimeout(ConnectionError, Timeout):
+    """连接超时，请求未发出"""
+
+    def __init__(self, *args):
+        super().__init__(*args, not_sent=True)
+
+
+class ReadTimeout(Timeout):
+    """读取响应超时"""
+
+
+class LiteCookies(dict):
+    def get_dict(self) -> dict:
+        return dict(self)
+
+
+class LiteResponse:
+    __slots__ = ("status_code", "headers", "content", "cookies")
+
+    def __init__(self, status_code: int, headers: http.client.HTTPMessage, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = _decode_content(content, headers.get("Content-Encoding", ""))
+        self.cookies = LiteCookies()
+        for header in headers.get_all("Set-Cookie") or ():
+            cookie = SimpleCookie()
+            try:
+                cookie.load(header)
+            except Exception:
+                continue
+            for key, morsel in cookie.items():
+                self.cookies[key] = morsel.value
+
+    @property
+    def encoding(self) -> str:
+        content_type = self.headers.get("Content-Type", "")
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset" and value:
+                return value.strip('"')
+        return "utf-8"
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def _decode_content(content: bytes, encoding: str) -> bytes:
+    """
+    按Content-Encoding解压响应体，支持gzip与deflate，解压失败时保留原始数据
+
+    :param content: 响应体
+    :param encoding: Content-Encoding
+    :return: 解压后的响应体
+    """
+    for coding in reversed([item.strip().lower() for item in encoding.split(",") if item.strip()]):
+        try:
+            if coding in ("gzip", "x-gzip"):
+                content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+            elif coding == "deflate":
+                try:
+                    content = zlib.decompress(content)
+                except zlib.error:
+                    # 部分服务器发送不带zlib头的原始deflate数据
+                    content = zlib.decompress(content, -zlib.MAX_WBITS)
+        except zlib.error:
+            break
+    return content
+
+
+def _merge_headers(*sources: Optional[dict]) -> dict:
+    """合并请求头，名称不区分大小写，后出现的覆盖先出现的"""
+    merged = dict()
+    for source in sources:
+        for name, value in (source or dict()).items():
+            merged[name.lower()] = (name, value)
+    return dict(merged.values())
+
+
+def _is_dropped(conn: http.client.HTTPConnection) -> bool:
+    """空闲连接是否已被服务器关闭：空闲连接上不应有可读数据，可读意味着收到了FIN或异常数据"""
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class LiteSession:
+    """
+    共用的轻量Session
+
+    按主机保持有上限的空闲连接池，各线程取用空闲连接并在请求完成后归还，超过上限的连接直接关闭；
+    不保存任何Cookies，Cookies需要随请求传入
+    """
+
+    def __init__(self, headers: dict, pool_maxsize: int):
+        """
+        :param headers: 公共请求头
+        :param pool_maxsize: 每个主机保持的空闲连接上限
+        """
+        self.headers = dict(headers)
+        self.pool_maxsize = max(1, pool_maxsize)
+        self._lock = threading.Lock()
+        self._pools = dict()
+        self._stats = dict()
+
+    def _connection(self, scheme: str, netloc: str, connect_timeout: float):
+        """取出到该主机的空闲连接，已被服务器关闭的连接直接丢弃，没有可用连接时新建，返回连接与是否为新建连接"""
+        while True:
+            with self._lock:
+                pool = self._pools.get((scheme, netloc))
+                conn = pool.pop() if pool else None
+            if conn is None:
+                break
+            if not _is_dropped(conn):
+                return conn, False
+            conn.close()
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=connect_timeout)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=connect_timeout)
+        return conn, True
+
+    def _release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection):
+        """归还连接，空闲连接已达上限时关闭"""
+        with self._lock:
+            pool = self._pools.setdefault((scheme, netloc), list())
+            if len(pool) < self.pool_maxsize:
+                pool.append(conn)
+                return
+        conn.close()
+
+    def _count(self, scheme: str, conn: http.client.HTTPConnection, created: bool):
+        host = f"{scheme}://{conn.host}:{conn.port}"
+        with self._lock:
+            stat = self._stats.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+            stat["requests"] += 1
+            if created:
+                stat["connections"] += 1
+            else:
+                stat["reused"] += 1
+
+    def request(self, method: str, url: str, data: dict = None, headers: dict = None, cookies: dict = None,
+                timeout=None) -> LiteResponse:
+        """
+        发送请求
+
+        空闲连接在复用前检查是否已被服务器关闭；请求发出后连接中断时不会自动重新发送，与requests(urllib3)的处理一致，
+        由调用方根据请求是否幂等决定是否重试
+
+        :param method: 请求方法
+        :param url: 请求地址
+        :param data: 表单数据
+        :param headers: 请求头，覆盖公共请求头
+        :param cookies: Cookies
+        :param timeout: 超时时间(秒)，可以为(连接, 读取)
+        :return: 响应
+        """
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        extra = dict()
+        body = None
+        if data is not None:
+            body = urlencode(data).encode("utf-8")
+            extra["Content-Type"] = "application/x-www-form-urlencoded"
+        if cookies:
+            extra["Cookie"] = "; ".join(f"{key}={value}" for key, value in cookies.items())
+        all_headers = _merge_headers(self.headers, headers, extra)
+
+        conn, created = self._connection(parts.scheme, parts.netloc, connect_timeout)
+        if conn.sock is None:
+            try:
+                conn.connect()
+            except socket.timeout as err:
+                conn.close()
+                raise ConnectTimeout(f"连接超时：{url}") from err
+            except OSError as err:
+                conn.close()
+                raise ConnectionError(f"连接失败：{url}", not_sent=True) from err
+        conn.sock.settimeout(read_timeout)
+        try:
+            conn.request(method, path, body=body, headers=all_headers)
+            resp = conn.getresponse()
+            content = resp.read()
+        except socket.timeout as err:
+            conn.close()
+            raise ReadTimeout(f"读取超时：{url}") from err
+        except (OSError, http.client.HTTPException) as err:
+            # 请求可能已被服务器处理，是否重试由调用方根据请求是否幂等决定
+            conn.close()
+            raise ConnectionError(f"连接中断：{url}") from err
+        self._count(parts.scheme, conn, created)
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(parts.scheme, parts.netloc, conn)
+        return LiteResponse(resp.status, resp.headers, content)
+
+    def close(self):
+        """关闭所有空闲连接，使用中的连接在归还后仍会保留"""
+        with self._lock:
+            pools, self._pools = self._pools, dict()
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {host: dict(stat) for host, stat in self._stats.items()}
+
+
+def can_retry(err: Exception, idempotent: bool) -> bool:
+    """
+    判断请求异常后能否重试，规则与requests实现一致
+
+    :param err: 请求异常
+    :param idempotent: 请求是否幂等
+    :return: 是否可以重试
+    """
+    if idempotent:
+        return isinstance(err, (ConnectionError, Timeout))
+    return isinstance(err, ConnectionError) and err.not_sent
+
+
+def create_session(headers: dict, pool_maxsize: int) -> LiteSession:
+    return LiteSession(headers, pool_maxsize)
+
+
+def stats(session: LiteSession) -> dict:
+    return session.stats()
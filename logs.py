@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = "%(asctime)s - %(label)s - %(levelname)s: %(message)s"
+
+_lock = threading.RLock()
+_queue = queue.Queue()
+_listener = None  # type: QueueListener
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式，与原有的日志格式保持一致"""
+
+    def __init__(self, fmt=TEXT_FORMAT):
+        super().__init__(fmt)
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "label"):
+            record.label = record.name
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON Lines格式，每条日志为一行JSON，账户上下文作为独立字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        data.update(getattr(record, "context", None) or dict())
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """将日志记录原样放入队列，消息格式化与输出均在后台线程中完成"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class ContextLogger(logging.LoggerAdapter):
+    """
+    带账户上下文的日志
+
+    上下文字段(如loginer_id、train_id)随每条日志输出，label为文本格式中显示的名称
+    """
+
+    def __init__(self, logger: logging.Logger, label: str = None, **context):
+        super().__init__(logger, context)
+        self.label = label or logger.name
+
+    def bind(self, label: str = None, **context):
+        """
+        更新上下文
+
+        :param label: 显示名称
+        :param context: 上下文字段，值为空的字段不输出
+        """
+        if label:
+            self.label = label
+        self.extra.update(context)
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {
+            "label": self.label,
+            "context": {key: value for key, value in self.extra.items() if value}
+        }
+        return msg, kwargs
+
+
+def configure(fmt: str = None, level=logging.INFO, stream=None):
+    """
+    配置日志输出，所有日志经由队列在后台线程中写出
+
+    :param fmt: 输出格式，text或json，默认读取环境变量XYB_LOG_FORMAT
+    :param level: 日志等级
+    :param stream: 输出流，默认为stderr
+    """
+    global _listener
+    fmt = fmt or os.environ.get("XYB_LOG_FORMAT", "text")
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+        _listener = QueueListener(_queue, handler)
+        _listener.start()
+        root = logging.getLogger("xyb")
+        root.setLevel(level)
+        root.propagate = False
+        if not root.handlers:
+            root.addHandler(_DeferredQueueHandler(_queue))
+
+
+def get_logger(name: str, **context) -> ContextLogger:
+    """
+    获得日志，首次调用时按默认配置启动后台写出线程
+
+    :param name: 名称
+    :param context: 上下文字段
+    :return: 日志
+    """
+    with _lock:
+        if _listener is None:
+            configure()
+    return ContextLogger(logging.getLogger(f"xyb.{name}"), name, **context)
+
+
+def flush():
+    """等待队列中的日志全部写出"""
+    if _listener is not None:
+        _queue.join()
+
+
+def shutdown():
+    """写出剩余日志并停止后台线程"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown)
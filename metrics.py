@@ -0,0 +1,174 @@
+import json
+import threading
+from typing import Dict, Tuple
+
+# 耗时直方图的分桶上限(秒)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+DESCRIPTIONS = {
+    "xyb_request_duration_seconds": "各接口的请求耗时",
+    "xyb_request_retries_total": "各接口的重试次数",
+    "xyb_response_codes_total": "各接口返回的code分布",
+    "xyb_webhook_duration_seconds": "Webhook回调耗时",
+    "xyb_webhook_results_total": "Webhook回调结果",
+    "xyb_accounts_total": "批量任务中各结果的账户数",
+    "xyb_batch_duration_seconds": "最近一次批量任务的耗时",
+    "xyb_limiter_limit": "自适应并发限制的当前窗口",
+    "xyb_limiter_open": "熔断器是否处于熔断或半开状态"
+}
+
+
+def endpoint_name(url: str) -> str:
+    """
+    获得接口名称，如GetPlan!detail
+
+    :param url: 请求地址
+    :return: 去除.action后缀的最后一级路径
+    """
+    name = url.split("?", 1)[0].rsplit("/", 1)[-1]
+    return name[:-len(".action")] if name.endswith(".action") else name
+
+
+class Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": dict(zip((str(bound) for bound in BUCKETS), self.buckets)),
+            "sum": round(self.sum, 6),
+            "count": self.count
+        }
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    运行指标
+
+    记录耗时直方图、计数器与数值，可导出为JSON或Prometheus文本格式，线程安全
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = dict()  # type: Dict[str, Dict[Labels, Histogram]]
+        self._counters = dict()  # type: Dict[str, Dict[Labels, float]]
+        self._gauges = dict()  # type: Dict[str, Dict[Labels, float]]
+
+    @staticmethod
+    def _labels(labels: dict) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        记录一次耗时
+
+        :param name: 指标名称
+        :param value: 耗时(秒)
+        :param labels: 标签
+        """
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, dict())
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        增加计数
+
+        :param name: 指标名称
+        :param value: 增加的数量
+        :param labels: 标签
+        """
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, dict())
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """
+        设置数值
+
+        :param name: 指标名称
+        :param value: 数值
+        :param labels: 标签
+        """
+        key = self._labels(labels)
+        with self._lock:
+            self._gauges.setdefault(name, dict())[key] = value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": {name: [dict(labels=dict(key), **histogram.to_dict())
+                                      for key, histogram in series.items()]
+                               for name, series in self._histograms.items()},
+                "counters": {name: [dict(labels=dict(key), value=value) for key, value in series.items()]
+                             for name, series in self._counters.items()},
+                "gauges": {name: [dict(labels=dict(key), value=value) for key, value in series.items()]
+                           for name, series in self._gauges.items()}
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """导出为Prometheus文本格式"""
+
+        def fmt_labels(key: Labels, extra: Labels = ()) -> str:
+            items = key + extra
+            if not items:
+                return ""
+            escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in items)
+            return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+        def header(name: str, metric_type: str):
+            if name in DESCRIPTIONS:
+                lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        lines = list()
+        with self._lock:
+            for name, series in self._histograms.items():
+                header(name, "histogram")
+                for key, histogram in series.items():
+                    for bound, count in zip(BUCKETS, histogram.buckets):
+                        lines.append(f"{name}_bucket{fmt_labels(key, (('le', str(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{fmt_labels(key, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{fmt_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{fmt_labels(key)} {histogram.count}")
+            for name, series in self._counters.items():
+                header(name, "counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{fmt_labels(key)} {value}")
+            for name, series in self._gauges.items():
+                header(name, "gauge")
+                for key, value in series.items():
+                    lines.append(f"{name}{fmt_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, prefix: str):
+        """
+        导出到文件
+
+        :param prefix: 文件路径前缀，将写入<prefix>.json与<prefix>.prom
+        """
+        with open(f"{prefix}.json", "w", encoding="utf-8") as fp:
+            fp.write(self.to_json())
+        with open(f"{prefix}.prom", "w", encoding="utf-8") as fp:
+            fp.write(self.to_prometheus())
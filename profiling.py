@@ -0,0 +1,181 @@
+"""
+性能分析
+
+在批量任务期间以cProfile记录所有线程的函数耗时，并以tracemalloc记录内存分配，任务结束后输出耗时最高的函数、
+各类操作(签名、JSON解析、日志、网络、等待)的耗时汇总与分配内存最多的代码行
+
+仅在开启性能分析时导入，关闭时没有任何额外开销
+"""
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from typing import List, Optional
+
+# 报告中列出的函数与代码行数量
+TOP = 15
+
+# 按文件路径或内置函数名归类耗时，先匹配的分类优先
+CATEGORIES = (
+    ("签名", ("signer.py",)),
+    ("JSON", ("/json/", "_json.")),
+    ("日志", ("/logging/", "logs.py")),
+    ("网络", ("socket", "_ssl.", "ssl.py", "/http/", "/urllib3/", "/requests/", "transport.py")),
+    ("等待", ("_thread.lock", "_queue.", "time.sleep", "threading.py", "queue.py", "/concurrent/"))
+)
+
+
+def _location(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    parts = filename.replace("\\", "/").rsplit("/", 2)
+    return f"{'/'.join(parts[-2:])}:{line}({name})"
+
+
+def _category(func: tuple) -> str:
+    filename, _, name = func
+    text = name if filename == "~" else filename.replace("\\", "/")
+    for category, patterns in CATEGORIES:
+        if any(pattern in text for pattern in patterns):
+            return category
+    return "其他"
+
+
+class Profiler:
+    """
+    批量任务性能分析
+
+    主线程与分析期间新建的线程(如任务线程池、回调线程)各自使用独立的cProfile，结束后合并统计；
+    线程中的cProfile只能在该线程内停止，分析结束后仍会运行的守护线程(如历史记录写入线程)不做记录，
+    避免常驻运行时关闭性能分析后这些线程仍有额外开销；
+    Python 3.12及以上版本的cProfile对所有线程生效，新线程不再单独记录，结束时一并停止
+    """
+
+    def __init__(self, top: int = TOP, memory: bool = True):
+        """
+        :param top: 报告中列出的函数与代码行数量
+        :param memory: 是否同时记录内存分配，开启后任务耗时会明显增加
+        """
+        self.top = top
+        self.memory = memory
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+        self._profiles = list()  # type: List[cProfile.Profile]
+        self._stats = None  # type: Optional[pstats.Stats]
+        self._snapshot = None  # type: Optional[tracemalloc.Snapshot]
+        self._peak = 0
+        self._start = 0.0
+        self._tracing = False
+        self._stopped = False
+
+    def _profile_thread(self, *_):
+        """新线程中的首个profile事件：改为由该线程独立的cProfile记录，守护线程与分析结束后开始的线程不记录"""
+        sys.setprofile(None)
+        if self._stopped or threading.current_thread().daemon:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 已有全局生效的cProfile
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        threading.setprofile(self._profile_thread)
+        self._start = time.perf_counter()
+        profile.enable()
+
+    def stop(self):
+        main = self._profiles[0]
+        main.disable()
+        self.elapsed = time.perf_counter() - self._start
+        threading.setprofile(None)
+        self._stopped = True
+        with self._lock:
+            profiles = list(self._profiles)
+        # 仍在运行的线程的统计截至此刻
+        self._stats = pstats.Stats(main)
+        for profile in profiles[1:]:
+            self._stats.add(profile)
+        if self._tracing:
+            self._snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, pstats.__file__),
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, __file__)
+            ))
+            self._peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self._tracing = False
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def report(self) -> dict:
+        """
+        性能分析报告
+
+        :return: 总耗时、线程数、各类操作的耗时汇总、耗时最高的函数与分配内存最多的代码行
+        """
+        categories = dict()
+        functions = list()
+        for func, (_, calls, tottime, cumtime, _) in self._stats.stats.items():
+            category = _category(func)
+            categories[category] = categories.get(category, 0) + tottime
+            functions.append((tottime, cumtime, calls, func))
+        functions.sort(key=lambda item: -item[0])
+        result = {
+            "elapsed": round(self.elapsed, 4),
+            "threads": len(self._profiles),
+            "categories": {name: round(value, 4) for name, value in
+                           sorted(categories.items(), key=lambda item: -item[1])},
+            "hotspots": [{
+                "function": _location(func),
+                "calls": calls,
+                "tottime": round(tottime, 4),
+                "cumtime": round(cumtime, 4)
+            } for tottime, cumtime, calls, func in functions[:self.top]]
+        }
+        if self._snapshot is not None:
+            result["memory_peak_kb"] = round(self._peak / 1024, 1)
+            result["allocations"] = [{
+                "location": f"{stat.traceback[0].filename.replace(chr(92), '/').rsplit('/', 1)[-1]}:"
+                            f"{stat.traceback[0].lineno}",
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count
+            } for stat in self._snapshot.statistics("lineno")[:self.top]]
+        return result
+
+    def format_report(self, report: dict = None) -> str:
+        """
+        将报告格式化为便于阅读的文本
+
+        :param report: 性能分析报告，默认重新生成
+        :return: 多行文本
+        """
+        report = report or self.report()
+        lines = [f"性能分析：耗时 {report['elapsed']:.3f} 秒，记录 {report['threads']} 个线程(各线程耗时累加)"]
+        lines.append("  " + "，".join(f"{name} {value:.3f}s" for name, value in report["categories"].items()))
+        lines.append(f"  {'自身耗时':>8} {'累计耗时':>8} {'调用次数':>8}  函数")
+        for item in report["hotspots"]:
+            lines.append(f"  {item['tottime']:>10.4f} {item['cumtime']:>10.4f} {item['calls']:>10}  "
+                         f"{item['function']}")
+        if "allocations" in report:
+            lines.append(f"  内存峰值 {report['memory_peak_kb']:.1f} KB，仍未释放的分配：")
+            for item in report["allocations"]:
+                lines.append(f"  {item['size_kb']:>10.1f} KB {item['count']:>8} 次  {item['location']}")
+        return "\n".join(lines)
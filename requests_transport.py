@@ -0,0 +1,85 @@
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# 同时缓存的主机连接池数量
+POOL_CONNECTIONS = 4
+
+RequestException = requests.RequestException
+
+
+class SharedAdapter(HTTPAdapter):
+    """
+    所有账户共用的连接池
+
+    各账户的Cookies随请求传入，连接由该适配器按主机统一复用
+    """
+
+    def close(self):
+        """Session关闭时不关闭共用的连接池，需要时请调用shutdown"""
+
+    def shutdown(self):
+        """关闭连接池中的所有连接"""
+        super().close()
+
+    def stats(self) -> dict:
+        """
+        连接复用统计
+
+        :return: 各主机的请求数、新建连接数与复用次数
+        """
+        result = dict()
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            result[host] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections,
+                "reused": max(pool.num_requests - pool.num_connections, 0)
+            }
+        return result
+
+
+def can_retry(err: Exception, idempotent: bool) -> bool:
+    """
+    判断请求异常后能否重试
+
+    幂等请求在连接或超时异常时均可重试；非幂等请求(如打卡)仅在确认请求未发出时重试，避免重复提交
+
+    :param err: 请求异常
+    :param idempotent: 请求是否幂等
+    :return: 是否可以重试
+    """
+    if idempotent:
+        return isinstance(err, (requests.ConnectionError, requests.Timeout))
+    if isinstance(err, requests.ConnectTimeout):
+        return True
+    reason = getattr(err.args[0], "reason", None) if err.args else None
+    return isinstance(err, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def create_session(headers: dict, pool_maxsize: int) -> requests.Session:
+    """
+    创建共用的Session，不保存任何Cookies
+
+    :param headers: 公共请求头
+    :param pool_maxsize: 每个主机保持的长连接上限
+    :return: Session
+    """
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = SharedAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
+def stats(session: requests.Session) -> dict:
+    """连接复用统计"""
+    return session.adapters["https://"].stats()
@@ -0,0 +1,144 @@
+"""
+账户分片执行
+
+按账户标识的稳定哈希将accounts.json拆分为若干分片，每个进程或云函数实例只处理其中一片，最后合并各分片的报告
+
+    python shard.py run --shards 4 [--sign-out] [--overwrite] [--file accounts.json]
+    python shard.py merge report-0.json report-1.json ...
+"""
+import sys
+import json
+import hashlib
+import argparse
+import multiprocessing
+from typing import List, Optional, Tuple
+
+from xyb import XybSign, account_key
+
+
+def shard_of(config: dict, count: int) -> int:
+    """
+    计算账户所属分片，同一账户在任意进程中的结果一致
+
+    :param config: 账户配置
+    :param count: 分片数量
+    :return: 分片下标
+    """
+    digest = hashlib.md5(account_key(config).encode("utf-8")).hexdigest()
+    return int(digest, 16) % count
+
+
+def select_shard(accounts: List[dict], index: int, count: int) -> List[dict]:
+    """
+    筛选属于指定分片的账户配置
+
+    :param accounts: 账户配置列表
+    :param index: 分片下标
+    :param count: 分片数量
+    :return: 该分片的账户配置，顺序与原列表一致
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"分片下标超出范围：{index}/{count}")
+    return [acc for acc in accounts if shard_of(acc, count) == index]
+
+
+def parse_shard(value) -> Optional[Tuple[int, int]]:
+    """
+    解析分片参数，格式为"下标/数量"，如"0/4"
+
+    :param value: 分片参数
+    :return: 分片下标与数量，未指定时返回None
+    :raises ValueError: 格式不正确或下标超出范围
+    """
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"分片参数格式不正确，应为\"下标/数量\"：{value}") from None
+    if not 0 <= index < count:
+        raise ValueError(f"分片下标超出范围：{index}/{count}")
+    return index, count
+
+
+def merge_reports(reports: List[dict]) -> dict:
+    """
+    合并各分片的批量任务报告
+
+    :param reports: 各分片的报告
+    :return: 合并后的报告，回调数据按分片顺序拼接
+    """
+    merged = {
+        "sign_type": reports[0]["sign_type"] if reports else None,
+        "success": 0,
+        "failure": 0,
+        "results": list()
+    }
+    for report in reports:
+        if report["sign_type"] != merged["sign_type"]:
+            raise ValueError("无法合并签到与签退的报告")
+        merged["success"] += report["success"]
+        merged["failure"] += report["failure"]
+        merged["results"].extend(report["results"])
+    return merged
+
+
+def run_shard(args: tuple) -> dict:
+    """
+    执行单个分片的批量任务
+
+    :param args: (配置文件, 分片下标, 分片数量, 签到/签出类型, 是否覆盖, XybSign参数)
+    :return: 分片报告
+    """
+    file, index, count, sign_type, overwrite, options = args
+    tools = XybSign(file, shard=(index, count), **options)
+    return tools.sign_in_all(overwrite) if sign_type else tools.sign_out_all(overwrite)
+
+
+def run_sharded(file: str, shards: int, sign_type: bool, overwrite=False, **options) -> dict:
+    """
+    在本地以多进程执行全部分片
+
+    :param file: 账户配置文件
+    :param shards: 分片数量(进程数)
+    :param sign_type: 签到/签出类型
+    :param overwrite: 已经签到/签退时是否覆盖
+    :param options: XybSign的其他参数
+    :return: 合并后的报告
+    """
+    tasks = [(file, index, shards, sign_type, overwrite, options) for index in range(shards)]
+    with multiprocessing.Pool(shards) as pool:
+        reports = pool.map(run_shard, tasks)
+    return merge_reports(reports)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="账户分片执行")
+    sub = parser.add_subparsers(dest="command")
+    run = sub.add_parser("run", help="以多进程执行全部分片")
+    run.add_argument("--file", default="accounts.json", help="账户配置文件")
+    run.add_argument("--shards", type=int, default=multiprocessing.cpu_count(), help="分片数量")
+    run.add_argument("--workers", type=int, default=1, help="每个分片的并发数")
+    run.add_argument("--sign-out", action="store_true", help="执行签退，默认为签到")
+    run.add_argument("--overwrite", action="store_true", help="已经签到/签退时覆盖")
+    merge = sub.add_parser("merge", help="合并各分片的报告文件")
+    merge.add_argument("reports", nargs="+", help="报告文件(JSON)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_sharded(args.file, args.shards, not args.sign_out, args.overwrite, workers=args.workers)
+    elif args.command == "merge":
+        reports = list()
+        for file in args.reports:
+            with open(file, encoding="utf-8") as fp:
+                reports.append(json.load(fp))
+        report = merge_reports(reports)
+    else:
+        parser.print_help()
+        sys.exit(1)
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import re
+import time
+import random
+import hashlib
+from typing import List, Iterable
+from urllib.parse import quote
+
+# 密码本
+COOKBOOK = ("5", "b", "f", "A", "J", "Q", "g", "a", "l", "p", "s", "q", "H", "4", "L", "Q", "g", "1", "6", "Q",
+            "Z", "v", "w", "b", "c", "e", "2", "2", "m", "l", "E", "g", "G", "H", "I", "r", "o", "s", "d", "5",
+            "7", "x", "t", "J", "S", "T", "F", "v", "w", "4", "8", "9", "0", "K", "E", "3", "4", "0", "m", "r",
+            "i", "n")
+# 不参与签名的字段，顺序与重复项需与小程序保持一致
+EXCEPT_KEYS = ("content", "deviceName", "keyWord", "blogBody", "blogTitle", "getType", "responsibilities",
+               "street", "text", "reason", "searchvalue", "key", "answers", "leaveReason", "personRemark",
+               "selfAppraisal", "imgUrl", "wxname", "deviceId", "avatarTempPath", "file", "file", "model",
+               "brand", "system", "deviceId", "platform")
+VERSION = "1.7.14"
+
+_EXCEPT_KEY_SET = frozenset(EXCEPT_KEYS)
+_EXCEPT_HEADER = ",".join(EXCEPT_KEYS)
+_RE_PUNCTUATION = re.compile("[`~!@#$%^&*()+=|{}':;',\\[\\].<>/?~！@#￥%……&*（）——+|{}【】‘；：”“’。，、？]")
+# 空白字符与<>&-，删除字符集合的顺序不影响结果，故合并为一次替换
+_RE_STRIP = re.compile(r"[\s<>&\-]+")
+_RE_EMOJI = re.compile('\uD83C[\uDF00-\uDFFF]|\uD83D[\uDC00-\uDE4F]')
+
+
+def random_noce(size: int = 20) -> List[int]:
+    """
+    生成随机数列表
+
+    :param size: 长度
+    :return: 密码本下标列表
+    """
+    return [random.randrange(len(COOKBOOK)) for _ in range(size)]
+
+
+def sign(data: dict, noce: List[int] = None, now_time: int = None) -> dict:
+    """
+    请求签名
+
+    :param data: 请求体数据
+    :param noce: 随机数列表(下标不能超过密码本长度)
+    :param now_time: 时间戳
+    :return: 签名用Headers
+    """
+    noce = noce if noce else random_noce()
+    now_time = now_time if now_time else int(time.time())
+    parts = list()
+    for k in sorted(data):
+        v = str(data[k])
+        if k not in _EXCEPT_KEY_SET and not _RE_PUNCTUATION.search(v):
+            parts.append(v)
+    parts.append(str(now_time))
+    parts.extend(COOKBOOK[i] for i in noce)
+    sign_str = _RE_EMOJI.sub("", _RE_STRIP.sub("", "".join(parts)))
+    sign_str = quote(sign_str)
+
+    return {
+        "n": _EXCEPT_HEADER,
+        "t": str(now_time),
+        "s": "_".join([str(i) for i in noce]),
+        "m": hashlib.md5(sign_str.encode('ascii')).hexdigest(),
+        "v": VERSION
+    }
+
+
+def sign_many(payloads: Iterable[dict], now_time: int = None) -> List[dict]:
+    """
+    批量请求签名
+
+    :param payloads: 请求体数据列表
+    :param now_time: 时间戳，默认为同一时刻
+    :return: 与请求体顺序一致的签名用Headers列表
+    """
+    now_time = now_time if now_time else int(time.time())
+    return [sign(data, now_time=now_time) for data in payloads]
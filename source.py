@@ -0,0 +1,66 @@
+import json
+from typing import Iterator
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _iter_json_lines(fp) -> Iterator[dict]:
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _iter_json_array(fp) -> Iterator[dict]:
+    """逐个解析JSON数组中的元素，仅在内存中保留当前未解析完的部分"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        pos = 0
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ",")):
+            pos += 1
+        buffer = buffer[pos:]
+        if buffer and not started:
+            if buffer[0] != "[":
+                raise ValueError("账户配置文件的根元素必须为数组")
+            started = True
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith("]"):
+            return
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                # 元素之后需要出现分隔符才能确认数字等元素已经完整
+                if end < len(buffer) or eof:
+                    buffer = buffer[end:]
+                    yield item
+                    continue
+        if eof:
+            raise ValueError("账户配置文件不完整")
+        chunk = fp.read(CHUNK_SIZE)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def iter_accounts(file: str) -> Iterator[dict]:
+    """
+    流式读取账户配置
+
+    后缀为.jsonl时每行一个账户配置，否则按JSON数组逐个解析，不会一次性载入整个文件
+
+    :param file: 账户配置文件
+    :return: 账户配置迭代器
+    """
+    with open(file, encoding="utf-8") as fp:
+        if file.endswith(".jsonl"):
+            yield from _iter_json_lines(fp)
+        else:
+            yield from _iter_json_array(fp)
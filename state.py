@@ -0,0 +1,126 @@
+import json
+from typing import Iterable, Iterator
+
+
+class AccountState:
+    """
+    账户状态
+
+    仅保存账户配置、会话与考勤状态，不包含网络连接与日志，可以大量保存在内存中并快速序列化
+    """
+    __slots__ = (
+        # 账户配置
+        "open_id", "union_id", "location", "account", "account_pass",
+        # 会话
+        "session_id", "cookies",
+        # 用户与实习信息
+        "loginer_id", "user_name", "phone", "train_id", "train_type", "post_state", "sign_lat", "sign_lng",
+        # 考勤状态
+        "is_sign_in", "is_sign_out", "user_info_init", "train_init"
+    )
+
+    def __init__(self, location: dict, account: str = None, account_pass: str = None, open_id: str = None,
+                 union_id: str = None):
+        """
+        :param location: 地址信息
+        :param account: 手机号
+        :param account_pass: 密码
+        :param open_id: 小程序OpenID
+        :param union_id: 小程序UnionID
+        """
+        self.open_id = open_id
+        self.union_id = union_id
+        self.location = location
+        self.account = account
+        self.account_pass = account_pass
+        self.session_id = ""
+        self.cookies = dict()
+        self.loginer_id = ""
+        self.user_name = ""
+        self.phone = ""
+        self.train_id = ""
+        self.train_type = 0
+        self.post_state = 0
+        self.sign_lat = self.location.get("lat", 0)
+        self.sign_lng = self.location.get("lng", 0)
+        self.is_sign_in = False
+        self.is_sign_out = False
+        self.user_info_init = False
+        self.train_init = False
+
+    @classmethod
+    def from_config(cls, config: dict) -> "AccountState":
+        """
+        根据账户配置创建状态
+
+        :param config: 账户配置
+        :return: 账户状态
+        """
+        return cls(config.get("location"), config.get("username"), config.get("password"), config.get("openid"),
+                   config.get("unionid"))
+
+    def to_list(self) -> list:
+        """按__slots__顺序导出为列表，用于紧凑的快照"""
+        return [getattr(self, field) for field in AccountState.__slots__]
+
+    @classmethod
+    def from_list(cls, values: list) -> "AccountState":
+        """
+        从to_list的结果恢复
+
+        :param values: 字段值列表
+        :return: 账户状态
+        """
+        state = cls.__new__(cls)
+        for field, value in zip(AccountState.__slots__, values):
+            setattr(state, field, value)
+        return state
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in AccountState.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AccountState":
+        state = cls(data.get("location"))
+        for field in AccountState.__slots__:
+            if field in data:
+                setattr(state, field, data[field])
+        return state
+
+
+def dump_states(states: Iterable[AccountState], file: str) -> int:
+    """
+    保存账户状态快照，每行一个账户，首行为字段名
+
+    快照中包含账户密码等配置，请注意文件权限
+
+    :param states: 账户状态
+    :param file: 快照文件
+    :return: 账户数量
+    """
+    count = 0
+    with open(file, "w", encoding="utf-8") as fp:
+        fp.write(json.dumps(AccountState.__slots__) + "\n")
+        for state in states:
+            fp.write(json.dumps(state.to_list(), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def load_states(file: str) -> Iterator[AccountState]:
+    """
+    读取账户状态快照，字段与当前版本不一致时按字段名恢复
+
+    :param file: 快照文件
+    :return: 账户状态迭代器
+    """
+    with open(file, encoding="utf-8") as fp:
+        fields = tuple(json.loads(fp.readline()))
+        for line in fp:
+            if not line.strip():
+                continue
+            values = json.loads(line)
+            if fields == AccountState.__slots__:
+                yield AccountState.from_list(values)
+            else:
+                yield AccountState.from_dict(dict(zip(fields, values)))
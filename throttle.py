@@ -0,0 +1,194 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断期间拒绝请求"""
+
+
+class AcquireTimeout(RuntimeError):
+    """等待请求许可超时"""
+
+
+class AdaptiveLimiter:
+    """
+    自适应并发限制与熔断
+
+    按AIMD方式调整同时进行的请求数：请求成功且耗时低于目标时缓慢增加窗口，出现异常或耗时过高时减半；
+    最近一段请求的失败率过高时熔断，熔断期间的请求等待冷却结束，冷却后放行单个探测请求，成功后从最小窗口恢复；
+    探测失败后直到下一次探测成功前，请求将直接被拒绝
+    """
+
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 64, latency_target: float = 1.0,
+                 window: int = 20, failure_rate: float = 0.5, cooldown: float = 10):
+        """
+        :param initial: 初始并发窗口
+        :param minimum: 最小并发窗口
+        :param maximum: 最大并发窗口
+        :param latency_target: 目标耗时(秒)，超过时视为服务器拥塞
+        :param window: 计算失败率的最近请求数
+        :param failure_rate: 触发熔断的失败率
+        :param cooldown: 熔断持续时间(秒)
+        """
+        self.minimum = max(1.0, float(minimum))
+        self.maximum = max(self.minimum, float(maximum))
+        self.limit = min(max(float(initial), self.minimum), self.maximum)
+        self.latency_target = latency_target
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.breaker = CLOSED
+        self._outcomes = deque(maxlen=max(1, int(window)))
+        self._opened_at = 0.0
+        self._decreased_at = 0.0
+        self._probing = False
+        self._probe_failed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = None):
+        """
+        获得请求许可，窗口已满或熔断冷却期间等待
+
+        :param timeout: 最长等待时间(秒)，默认一直等待
+        :raise CircuitOpenError: 熔断且探测失败期间
+        :raise AcquireTimeout: 超过最长等待时间仍未获得许可
+        """
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                wait = 1.0
+                if self.breaker == OPEN:
+                    remaining = self._opened_at + self.cooldown - time.monotonic()
+                    if remaining > 0:
+                        if self._probe_failed:
+                            raise CircuitOpenError("服务器连续请求失败，已暂停请求")
+                        if expires is not None and expires < self._opened_at + self.cooldown:
+                            # 冷却结束前已超过最长等待时间，无需等待
+                            raise AcquireTimeout("熔断冷却期间等待请求许可超时")
+                        wait = remaining
+                    else:
+                        self.breaker = HALF_OPEN
+                if self.breaker == HALF_OPEN:
+                    # 半开状态下仅放行一个探测请求
+                    if not self._probing:
+                        self._probing = True
+                        self.inflight += 1
+                        return
+                elif self.breaker == CLOSED and self.inflight < int(self.limit):
+                    self.inflight += 1
+                    return
+                if expires is not None:
+                    left = expires - time.monotonic()
+                    if left <= 0:
+                        raise AcquireTimeout("等待请求许可超时")
+                    wait = min(wait, left)
+                self._cond.wait(wait)
+
+    def cancel(self):
+        """归还未使用的请求许可，不计入请求结果"""
+        with self._cond:
+            self.inflight -= 1
+            if self.breaker == HALF_OPEN and self._probing:
+                self._probing = False
+            self._cond.notify_all()
+
+    def release(self, latency: float, ok: bool):
+        """
+        归还请求许可并根据结果调整窗口
+
+        :param latency: 请求耗时(秒)
+        :param ok: 请求是否成功(无网络异常且响应可以解析)
+        """
+        now = time.monotonic()
+        with self._cond:
+            self.inflight -= 1
+            if self.breaker == HALF_OPEN and self._probing:
+                self._probing = False
+                self._probe_failed = not ok
+                if ok:
+                    self.breaker = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+            elif self.breaker == CLOSED:
+                self._outcomes.append(ok)
+                if ok and latency <= self.latency_target:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                # 同一批拥塞信号只减半一次
+                elif now - self._decreased_at > self.latency_target:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._decreased_at = now
+                if len(self._outcomes) == self._outcomes.maxlen and self.error_rate() >= self.failure_rate:
+                    self._open(now)
+            self._cond.notify_all()
+
+    def _open(self, now: float):
+        self.breaker = OPEN
+        self._opened_at = now
+        self.limit = self.minimum
+
+    def error_rate(self) -> float:
+        """最近请求的失败率"""
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def state(self) -> dict:
+        """当前窗口、进行中的请求数与熔断状态"""
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "inflight": self.inflight,
+                "breaker": self.breaker,
+                "error_rate": round(self.error_rate(), 3)
+            }
+
+
+_options = None  # type: Optional[dict]
+_limiters = dict()  # type: Dict[str, AdaptiveLimiter]
+_lock = threading.Lock()
+
+
+def configure(enabled: bool = True, **options):
+    """
+    启用或停用自适应并发限制，各主机独立计算
+
+    :param enabled: 是否启用
+    :param options: AdaptiveLimiter的参数
+    """
+    global _options
+    with _lock:
+        _options = options if enabled else None
+        _limiters.clear()
+
+
+def get_limiter(url: str) -> Optional[AdaptiveLimiter]:
+    """
+    获得请求地址所属主机的限制器，未启用时返回None
+
+    :param url: 请求地址
+    :return: 限制器
+    """
+    if _options is None:
+        return None
+    host = urlsplit(url).netloc
+    with _lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = AdaptiveLimiter(**_options)
+        return limiter
+
+
+def stats() -> dict:
+    """各主机限制器的状态，未启用时为空"""
+    with _lock:
+        limiters = dict(_limiters)
+    return {host: limiter.state() for host, limiter in limiters.items()}
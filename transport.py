@@ -0,0 +1,78 @@
+import os
+import threading
+
+# 每个主机保持的长连接上限
+POOL_MAXSIZE = 10
+# 传输实现：requests，或仅使用标准库http.client的lite(导入更快，适合云函数冷启动)
+BACKENDS = ("requests", "lite")
+
+_backend_name = os.environ.get("XYB_TRANSPORT", "requests")
+_pool_maxsize = POOL_MAXSIZE
+_session = None
+_lock = threading.Lock()
+
+
+def _backend():
+    """按需导入传输实现，未使用的实现不会被导入"""
+    if _backend_name == "lite":
+        import lite_transport as backend
+    else:
+        import requests_transport as backend
+    return backend
+
+
+def configure(pool_maxsize: int = None, backend: str = None):
+    """
+    配置连接池大小与传输实现，需要在创建Session之前调用
+
+    :param pool_maxsize: 每个主机保持的长连接上限
+    :param backend: 传输实现，参考BACKENDS，默认读取环境变量XYB_TRANSPORT
+    """
+    global _pool_maxsize, _backend_name
+    if pool_maxsize is not None:
+        _pool_maxsize = max(1, int(pool_maxsize))
+    if backend is not None:
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的传输实现：{backend}")
+        _backend_name = backend
+
+
+def shared_session(headers: dict):
+    """
+    获得所有账户共用的Session
+
+    该Session使用共用的连接池，且不保存任何Cookies，各账户的Cookies需要随请求传入；
+    两种实现均提供request(method, url, data, headers, cookies, timeout)，响应提供json()、text与cookies
+
+    :param headers: 公共请求头，仅在首次创建时复制到Session中
+    :return: 共用的Session
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _backend().create_session(headers, _pool_maxsize)
+        return _session
+
+
+def request_errors() -> tuple:
+    """当前传输实现的请求异常类型，用于except"""
+    return _backend().RequestException,
+
+
+def can_retry(err: Exception, idempotent: bool) -> bool:
+    """
+    判断请求异常后能否重试
+
+    幂等请求在连接或超时异常时均可重试；非幂等请求(如打卡)仅在确认请求未发出时重试，避免重复提交
+
+    :param err: 请求异常
+    :param idempotent: 请求是否幂等
+    :return: 是否可以重试
+    """
+    return _backend().can_retry(err, idempotent)
+
+
+def stats() -> dict:
+    """连接复用统计，尚未创建Session时为空"""
+    session = _session
+    return _backend().stats(session) if session is not None else dict()
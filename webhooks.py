@@ -6,3 +6,8 @@ def on_sign_in(data):
 def on_sign_out(data):
     print("At sign out hook")
     print(data)
+
+
+def on_batch_complete(data_list):
+    print("At batch complete hook")
+    print(f"{len(data_list)} results")
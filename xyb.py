@@ -1,67 +1,331 @@
-import re
+import os
 import json
 import time
 import random
 import hashlib
-import logging
-from typing import Tuple, List
-from collections import Counter
-from urllib.parse import quote
+from typing import Tuple, List, Optional, Callable, Iterable, Iterator
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+import logs
+import signer
+import throttle
+import transport
+from cache import SessionCache
+from state import AccountState, dump_states, load_states
+from metrics import Metrics, endpoint_name
+from source import iter_accounts
+from dispatcher import WebhookDispatcher
+from journal import RunJournal
 
-from webhooks import on_sign_in, on_sign_out
 
+def account_key(config: dict) -> str:
+    """
+    获得账户唯一标识，与登录方式的优先级保持一致
 
-def init_logger(logger: logging.Logger, fmt="%(asctime)s - %(name)s - %(levelname)s: %(message)s"):
-    # logger.setLevel(logging.INFO)
-    formatter = logging.Formatter(fmt)
-    sh = logging.StreamHandler()
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
+    :param config: 账户配置
+    :return: 用户名或OpenID
+    """
+    if config.get("username") and config.get("password"):
+        return config["username"]
+    return config.get("openid") or ""
+
+
+class SessionRejectedError(RuntimeError):
+    """服务器返回了明确的错误code，缓存的会话已经失效"""
+
+
+class Deadline:
+    """运行截止时间，用于在云函数超时前停止开始新的任务"""
+
+    def __init__(self, seconds: float):
+        """
+        :param seconds: 距离截止的时间(秒)
+        """
+        self.expires = time.monotonic() + seconds
+
+    @classmethod
+    def from_context(cls, context, margin: float = None) -> Optional["Deadline"]:
+        """
+        根据SCF的context推算截止时间，需要在入口函数开始时调用
+
+        :param context: SCF入口函数的context
+        :param margin: 预留时间(秒)，默认为执行超时时间的20%且不超过5秒
+        :return: 截止时间，context中没有超时时间时返回None
+        """
+        limit = context.get("time_limit_in_ms") if isinstance(context, dict) else None
+        if not limit:
+            return None
+        limit = float(limit) / 1000
+        if margin is None:
+            margin = min(limit * 0.2, 5.0)
+        return cls(limit - margin)
+
+    def remaining(self) -> float:
+        """剩余时间(秒)"""
+        return self.expires - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
 
 
 class XybAccount:
-    def __init__(self, **config):
-        self.logger = logging.Logger("XybAccount", logging.INFO)
-        init_logger(self.logger)
-        self.train_init = False
-        self.session = requests.Session()
-        self.session.headers = XybSign.HEADERS
-        self.open_id = config.get("openid")
-        self.union_id = config.get("unionid")
-        self.location = config.get("location")
-        self.account = config.get("username")
-        self.account_pass = config.get("password")
-        self.session_id = ""
-        self.loginer_id = ""
-        self.user_name = ""
-        self.phone = ""
-        self.train_id = ""
-        self.train_type = 0
-        self.post_state = 0
-        self.sign_lat = self.location.get("lat", 0)
-        self.sign_lng = self.location.get("lng", 0)
-        self.is_sign_in = False
-        self.is_sign_out = False
+    """
+    账户客户端
+
+    账户配置、会话与考勤状态保存在AccountState中(可以通过同名属性访问)，网络请求使用所有账户共用的Session
+    """
+    __slots__ = ("state", "session", "logger", "cache", "reconcile", "metrics", "timings", "train_loaded_at",
+                 "need_verify", "request_count", "last_error", "deadline")
+    CACHE_FIELDS = ("session_id", "loginer_id", "phone", "user_name", "train_id")
+    # 打卡后的考勤状态同步方式
+    RECONCILE_FETCH = "fetch"  # 每次打卡后重新拉取实习详情
+    RECONCILE_RESPONSE = "response"  # 根据打卡响应更新，响应不明确时立即拉取
+    RECONCILE_DEFERRED = "deferred"  # 根据打卡响应更新，响应不明确时由批量任务结束前统一拉取
+    TIMEOUT = (5, 10)  # 请求超时时间(连接, 读取)
+    RETRIES = 2  # 请求失败时的重试次数
+    BACKOFF = 0.5  # 首次重试的最大等待时间(秒)，之后每次翻倍并随机抖动
+    STATE_TTL = 300  # 考勤状态的有效期(秒)，超过后在下次任务前重新拉取
+    # 根据考勤状态决定的打卡动作
+    ACTION_AUTO = "auto"  # 自动触发签到
+    ACTION_NEW = "new"  # 新增签退
+    ACTION_UPDATE = "update"  # 覆盖已有的签到/签退
+    ACTION_DONE = "done"  # 已经签到/签退，无需操作
+    ACTION_INELIGIBLE = "ineligible"  # 当前状态无法操作，如未签到时签退
+    ACTION_ERROR = "error"  # 无法获得考勤状态
+    # 需要执行账户任务的动作，无法获得状态的账户将在任务中重试
+    WORK_ACTIONS = (ACTION_AUTO, ACTION_NEW, ACTION_UPDATE, ACTION_ERROR)
+    ACTION_NAMES = ((ACTION_AUTO, "自动"), (ACTION_NEW, "新增"), (ACTION_UPDATE, "覆盖"), (ACTION_DONE, "已完成"),
+                    (ACTION_INELIGIBLE, "无法操作"), (ACTION_ERROR, "状态未知"))
+
+    def __init__(self, lazy: bool = False, cache: SessionCache = None, reconcile: str = RECONCILE_RESPONSE,
+                 metrics: Metrics = None, state: AccountState = None, **config):
+        """
+        :param lazy: 延迟登录，为True时需要在使用前调用bootstrap
+        :param cache: 会话缓存，命中时将跳过登录流程
+        :param reconcile: 打卡后的考勤状态同步方式
+        :param metrics: 运行指标，记录各接口的耗时、重试次数与code分布
+        :param state: 账户状态，如从快照中恢复的状态，指定时忽略账户配置
+        :param config: 账户配置
+        """
+        self.state = state or AccountState.from_config(config)
+        self.logger = logs.get_logger("XybAccount")
+        if self.state.loginer_id:
+            self.logger.bind(label=f"XybAccount[{self.user_name or self.loginer_id}]", loginer_id=self.loginer_id,
+                             train_id=self.train_id)
+        # 从快照恢复的考勤状态需要在任务前重新拉取
+        self.train_loaded_at = 0.0
+        self.cache = cache
+        self.reconcile = reconcile
+        self.need_verify = False
+        self.request_count = 0
+        self.metrics = metrics
+        # 各接口的累计耗时(秒)，随回调数据输出后清空
+        self.timings = dict()
+        # 本次任务中最近一次请求错误与服务器返回的数据
+        self.last_error = None
+        # 批量任务的截止时间，进行中的请求按剩余时间缩短超时并停止重试
+        self.deadline = None  # type: Optional[Deadline]
+        # Session由所有账户共用，Cookies保存在账户状态中并随请求发送
+        self.session = transport.shared_session(XybSign.HEADERS)
+        if not lazy:
+            self.bootstrap()
+            if not self.user_info_init:
+                self.load_user_info()
+
+    @property
+    def key(self) -> str:
+        """账户唯一标识"""
+        return account_key(dict(username=self.account, password=self.account_pass, openid=self.open_id))
+
+    def bootstrap(self):
+        """登录并载入实习信息，用户信息将延迟到需要时再拉取"""
+
+        if self._restore_session():
+            # 网络异常、熔断或剩余时间不足时直接抛出，保留缓存的会话
+            try:
+                self.load_train_info()
+                return
+            except SessionRejectedError:
+                self.logger.warning("缓存的会话已失效，重新登录")
+                self.cache.invalidate(self.key)
+                self.cookies.clear()
         self.login()
-        self.load_user_info()
+        if not self.user_info_init:
+            self.logger.bind(label=f"XybAccount[{self.loginer_id}]")
         self.load_train()
         self.load_train_info()
+        self._store_session()
+
+    def _restore_session(self) -> bool:
+        """
+        从缓存中恢复会话与实习信息
+
+        :return: 是否命中缓存
+        """
+        cached = self.cache.get(self.key) if self.cache else None
+        if not cached:
+            return False
+        for field in XybAccount.CACHE_FIELDS:
+            setattr(self, field, cached.get(field, ""))
+        self.cookies["JSESSIONID"] = self.session_id
+        if self.user_name:
+            self.user_info_init = True
+        self.logger.bind(label=f"XybAccount[{self.user_name or self.loginer_id}]", loginer_id=self.loginer_id,
+                         train_id=self.train_id)
+        self.logger.info("已从缓存恢复会话：%s", self.loginer_id)
+        return True
 
-    def _request_error(self, msg: str, debug_data=None):
+    def _store_session(self):
+        """将会话与实习信息写入缓存"""
+        if self.cache and self.session_id and self.train_id:
+            self.cache.set(self.key, {field: getattr(self, field) for field in XybAccount.CACHE_FIELDS})
+
+    @property
+    def stale(self) -> bool:
+        """考勤状态是否已过期，常驻运行时上一次任务的状态不能用于本次任务"""
+        return self.train_init and time.monotonic() - self.train_loaded_at > XybAccount.STATE_TTL
+
+    def refresh(self):
+        """重新拉取考勤状态，服务器拒绝会话时重新登录；网络异常、熔断等错误直接抛出，不额外发起登录"""
+        try:
+            self.load_train_info()
+        except SessionRejectedError:
+            self.logger.warning("会话已失效，重新登录")
+            if self.cache:
+                self.cache.invalidate(self.key)
+            self.cookies.clear()
+            self.bootstrap()
+
+    def ensure_user_info(self):
+        """按需拉取用户信息，失败时不影响签到结果"""
+
+        if self.user_info_init or not self.loginer_id:
+            return
+        try:
+            self.load_user_info()
+        except RuntimeError:
+            self.logger.warning("用户信息拉取失败，回调数据中将缺少姓名")
+
+    def _request_error(self, msg: str, debug_data=None, error: type = RuntimeError):
         self.logger.error(msg)
         self.logger.info(debug_data)
-        raise RuntimeError(msg)
+        self.last_error = {"message": msg, "payload": debug_data}
+        raise error(msg)
 
-    def _except_json_resp(self, resp: requests.models.Response):
+    def _except_json_resp(self, resp):
         try:
-            return resp.json()
+            result = resp.json()
         except ValueError:
+            result = None
+        # 非JSON或缺少code的响应均视为服务器异常
+        if not isinstance(result, dict) or "code" not in result:
             return {
                 "code": 500,
                 "text": resp.text
             }
+        return result
+
+    def _request(self, method: str, url: str, data: dict = None, idempotent: bool = True) -> dict:
+        """
+        发送签名请求，签名头仅作用于本次请求
+
+        幂等请求在网络异常或非JSON响应时按退避时间重试，非幂等请求仅在确认未发出时重试；
+        启用自适应并发限制时，每次请求前需要获得所属主机的许可，熔断期间抛出CircuitOpenError；
+        设置截止时间时，等待许可与请求的超时时间均不超过剩余时间，剩余时间不足一次请求的超时时间时不再重试
+
+        :param method: 请求方法
+        :param url: 请求地址
+        :param data: 请求体数据
+        :param idempotent: 请求是否幂等
+        :return: 响应数据
+        """
+        endpoint = endpoint_name(url)
+        limiter = throttle.get_limiter(url)
+        for attempt in range(self.RETRIES + 1):
+            if self._timeout() is None:
+                self._request_error(f"剩余时间不足，放弃请求：{url}")
+            if attempt and self.metrics:
+                self.metrics.inc("xyb_request_retries_total", endpoint=endpoint)
+            headers = self.sign_header(data or {})
+            if limiter:
+                try:
+                    limiter.acquire(self.deadline.remaining() if self.deadline else None)
+                except throttle.AcquireTimeout:
+                    self._request_error(f"剩余时间不足，等待并发许可超时：{url}")
+            # 等待许可期间剩余时间减少，获得许可后重新计算超时时间
+            timeout = self._timeout()
+            if timeout is None:
+                if limiter:
+                    limiter.cancel()
+                self._request_error(f"剩余时间不足，放弃请求：{url}")
+            self.request_count += 1
+            start = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, data=data, headers=headers, cookies=self.cookies,
+                                            timeout=timeout)
+            except transport.request_errors() as err:
+                self._record(endpoint, start, type(err).__name__, False, limiter)
+                if attempt >= self.RETRIES or not transport.can_retry(err, idempotent) or not self._can_wait():
+                    self._request_error(f"请求失败：{url}", repr(err))
+                self.logger.warning("请求失败，准备重试(%d/%d)：%s", attempt + 1, self.RETRIES, url)
+            except Exception as err:
+                # 其他异常不重试，但需要归还并发许可
+                self._record(endpoint, start, type(err).__name__, False, limiter)
+                raise
+            else:
+                # 处理响应时出现异常也需要归还并发许可
+                code, ok = "invalid", False
+                try:
+                    if resp.cookies:
+                        self.cookies.update(resp.cookies.get_dict())
+                    result = self._except_json_resp(resp)
+                    code = result["code"]
+                    ok = code != 500
+                finally:
+                    self._record(endpoint, start, code, ok, limiter)
+                if result["code"] != 500 or not idempotent or attempt >= self.RETRIES or not self._can_wait():
+                    return result
+                self.logger.warning("响应异常，准备重试(%d/%d)：%s", attempt + 1, self.RETRIES, url)
+            time.sleep(random.uniform(0, self.BACKOFF * 2 ** attempt))
+
+    def _timeout(self) -> Optional[tuple]:
+        """
+        本次请求的超时时间，不超过截止时间前的剩余时间
+
+        :return: (连接, 读取)超时时间，已到达截止时间时返回None
+        """
+        if self.deadline is None:
+            return self.TIMEOUT
+        remaining = self.deadline.remaining()
+        if remaining <= 0:
+            return None
+        return tuple(min(value, remaining) for value in self.TIMEOUT)
+
+    def _can_wait(self) -> bool:
+        """剩余时间是否还足够重试一次，不足一次请求的超时时间时不再重试"""
+        if self.deadline is None:
+            return True
+        return self.deadline.remaining() >= sum(self.TIMEOUT)
+
+    def _record(self, endpoint: str, start: float, code, ok: bool = True,
+                limiter: throttle.AdaptiveLimiter = None):
+        """
+        记录单次请求的耗时与code，并归还并发许可
+
+        :param endpoint: 接口名称
+        :param start: 请求开始时间(perf_counter)
+        :param code: 响应code或异常类型
+        :param ok: 请求是否成功(无网络异常且响应可以解析)
+        :param limiter: 并发限制器
+        """
+        elapsed = time.perf_counter() - start
+        if limiter:
+            limiter.release(elapsed, ok)
+        self.timings[endpoint] = self.timings.get(endpoint, 0) + elapsed
+        if self.metrics:
+            self.metrics.observe("xyb_request_duration_seconds", elapsed, endpoint=endpoint)
+            self.metrics.inc("xyb_response_codes_total", endpoint=endpoint, code=code)
 
     def login(self):
         """自动登录，根据配置情况进行OpenID或者账号密码登录"""
@@ -82,14 +346,13 @@ class XybAccount:
             openId=self.open_id,
             unionId=self.union_id
         )
-        self.session.headers.update(self.sign_header(data))
-        resp = self.session.post(url=XybSign.URL_LOGIN_WX, data=data)
-        resp = self._except_json_resp(resp)
+        resp = self._request("POST", XybSign.URL_LOGIN_WX, data)
         if resp["code"] == "200":
             self.loginer_id = resp["data"]["loginerId"]
             self.session_id = resp["data"]["sessionId"]
             self.phone = resp["data"]["phone"]
-            self.logger.info(f"已登录(OpenID)：{self.loginer_id}")
+            self.logger.bind(loginer_id=self.loginer_id)
+            self.logger.info("已登录(OpenID)：%s", self.loginer_id)
         else:
             self._request_error(f"登录失败：{self.open_id}", resp)
 
@@ -101,14 +364,13 @@ class XybAccount:
             username=self.account,
             password=pass_hash.hexdigest()
         )
-        self.session.headers.update(self.sign_header(data))
-        resp = self.session.post(url=XybSign.URL_LOGIN_PHONE, data=data)
-        resp = self._except_json_resp(resp)
+        resp = self._request("POST", XybSign.URL_LOGIN_PHONE, data)
         if resp["code"] == "200":
             self.loginer_id = resp["data"]["loginerId"]
             self.session_id = resp["data"]["sessionId"]
             self.phone = resp["data"]["phone"]
-            self.logger.info(f"已登录(账户密码)：{self.loginer_id}")
+            self.logger.bind(loginer_id=self.loginer_id)
+            self.logger.info("已登录(账户密码)：%s", self.loginer_id)
         else:
             self._request_error(f"登录失败：{self.open_id}", resp)
 
@@ -121,56 +383,18 @@ class XybAccount:
         :param now_time: 时间戳
         :return: 签名用Headers
         """
-        re_punctuation = re.compile("[`~!@#$%^&*()+=|{}':;',\\[\\].<>/?~！@#￥%……&*（）——+|{}【】‘；：”“’。，、？]")
-        cookbook = ["5", "b", "f", "A", "J", "Q", "g", "a", "l", "p", "s", "q", "H", "4", "L", "Q", "g", "1", "6", "Q",
-                    "Z", "v", "w", "b", "c", "e", "2", "2", "m", "l", "E", "g", "G", "H", "I", "r", "o", "s", "d", "5",
-                    "7", "x", "t", "J", "S", "T", "F", "v", "w", "4", "8", "9", "0", "K", "E", "3", "4", "0", "m", "r",
-                    "i", "n"]
-        except_key = ["content", "deviceName", "keyWord", "blogBody", "blogTitle", "getType", "responsibilities",
-                      "street", "text", "reason", "searchvalue", "key", "answers", "leaveReason", "personRemark",
-                      "selfAppraisal", "imgUrl", "wxname", "deviceId", "avatarTempPath", "file", "file", "model",
-                      "brand", "system", "deviceId", "platform"]
-        noce = noce if noce else [random.randint(0, len(cookbook) - 1) for _ in range(20)]
-        now_time = now_time if now_time else int(time.time())
-        sorted_data = dict(sorted(data.items(), key=lambda x: x[0]))
-
-        sign_str = ""
-        for k, v in sorted_data.items():
-            v = str(v)
-            if k not in except_key and not re.search(re_punctuation, v):
-                self.logger.debug(f"Add keys: {k}")
-                sign_str += str(v)
-        sign_str += str(now_time)
-        sign_str += "".join([cookbook[i] for i in noce])
-        sign_str = re.sub(r'\s+', "", sign_str)
-        sign_str = re.sub(r'\n+', "", sign_str)
-        sign_str = re.sub(r'\r+', "", sign_str)
-        sign_str = sign_str.replace("<", "")
-        sign_str = sign_str.replace(">", "")
-        sign_str = sign_str.replace("&", "")
-        sign_str = sign_str.replace("-", "")
-        sign_str = re.sub(f'\uD83C[\uDF00-\uDFFF]|\uD83D[\uDC00-\uDE4F]', "", sign_str)
-        sign_str = quote(sign_str)
-        sign = hashlib.md5(sign_str.encode('ascii'))
-
-        return {
-            "n": ",".join(except_key),
-            "t": str(now_time),
-            "s": "_".join([str(i) for i in noce]),
-            "m": sign.hexdigest(),
-            "v": "1.7.14"
-        }
+        return signer.sign(data, noce, now_time)
 
     def load_user_info(self):
         """获得用户信息，取得userName"""
 
         # Loginer
-        self.session.headers.update(self.sign_header({}))
-        resp = self.session.get(url=XybSign.URL_ACCOUNT)
-        resp = self._except_json_resp(resp)
+        resp = self._request("GET", XybSign.URL_ACCOUNT)
         if resp["code"] == "200":
             self.user_name = resp["data"]["loginer"]
-            self.logger.name = f"XybAccount[{self.user_name}]"
+            self.logger.bind(label=f"XybAccount[{self.user_name}]")
+            self.user_info_init = True
+            self._store_session()
             self.logger.info("拉取用户信息完成")
         else:
             self._request_error(f"无法获取用户信息：{self.open_id}", resp)
@@ -179,14 +403,14 @@ class XybAccount:
         """获得train信息"""
 
         # TrainId
-        self.session.headers.update(self.sign_header({}))
-        resp = self.session.get(url=XybSign.URL_TRAIN)
-        resp = self._except_json_resp(resp)
+        resp = self._request("GET", XybSign.URL_TRAIN)
         if resp["code"] == "200":
             if "clockVo" in resp["data"]:
-                self.train_id = resp["data"]["clockVo"]["traineeId"]
-                self.logger.info(
-                    f"已载入默认实习：{resp['data']['clockVo']['planName']}({resp['data']['clockVo']['startDate']} - {resp['data']['clockVo']['endDate']})")
+                clock_vo = resp["data"]["clockVo"]
+                self.train_id = clock_vo["traineeId"]
+                self.logger.bind(train_id=self.train_id)
+                self.logger.info("已载入默认实习：%s(%s - %s)", clock_vo["planName"], clock_vo["startDate"],
+                                 clock_vo["endDate"])
             else:
                 self._request_error("未找到默认实习，实习可能已结束", resp["data"])
         else:
@@ -197,36 +421,65 @@ class XybAccount:
 
         # TrainInfo
         data = dict(traineeId=self.train_id)
-        self.session.headers.update(self.sign_header(data))
-        resp = self.session.post(url=XybSign.URL_TRAIN_INFO, data=data)
-        resp = self._except_json_resp(resp)
+        resp = self._request("POST", XybSign.URL_TRAIN_INFO, data)
         if resp["code"] == "200":
             self.train_type = resp["data"]["clockRuleType"]
             self.post_state = resp["data"]["postInfo"]["state"]
             self.is_sign_in = bool(resp["data"]["clockInfo"]["inTime"])
             self.is_sign_out = bool(resp["data"]["clockInfo"]["outTime"])
+            self.train_loaded_at = time.monotonic()
             if not self.train_init:
-                self.logger.info(f"实习类型：{'自主' if self.train_type else '集中'}，实习定位：{'有' if self.post_state else '无'}")
+                self.logger.info("实习类型：%s，实习定位：%s", "自主" if self.train_type else "集中",
+                                 "有" if self.post_state else "无")
                 if self.post_state:
                     if self.sign_lat and self.sign_lng:
-                        self.logger.warning(f"配置了一个有效的签到坐标{self.sign_lat}, {self.sign_lng}，将不再使用实习坐标")
+                        self.logger.warning("配置了一个有效的签到坐标%s, %s，将不再使用实习坐标", self.sign_lat, self.sign_lng)
                     else:
                         self.sign_lat = resp["data"]["postInfo"]["lat"]
                         self.sign_lng = resp["data"]["postInfo"]["lng"]
-                        self.logger.info(f"将使用获取到的实习坐标：{self.sign_lat}, {self.sign_lng}")
-            self.logger.info(
-                f"考勤状态：Sign in[{'√' if self.is_sign_in else 'x'}] || Sign out[{'√' if self.is_sign_out else 'x'}]")
+                        self.logger.info("将使用获取到的实习坐标：%s, %s", self.sign_lat, self.sign_lng)
+            self._log_clock_state()
             if not self.sign_lat:
                 self._request_error("无定位信息，请按照文档手动添加签到定位信息")
             self.train_init = True
+        elif resp.get("code") != 500:
+            # 服务器明确拒绝(而不是网络异常或非JSON响应)，通常是会话已经失效
+            self._request_error("无法加载实习信息", resp, SessionRejectedError)
         else:
             self._request_error("无法加载实习信息", resp)
 
+    def _log_clock_state(self):
+        self.logger.info("考勤状态：Sign in[%s] || Sign out[%s]", "√" if self.is_sign_in else "x",
+                         "√" if self.is_sign_out else "x")
+
+    def _reconcile(self, status: int, resp: dict):
+        """
+        打卡后同步考勤状态，打卡成功时直接根据响应更新，响应不明确时重新拉取实习详情
+
+        :param status: 签到/签出类型(1签出2签到)
+        :param resp: 打卡响应数据
+        """
+        if self.reconcile == XybAccount.RECONCILE_FETCH:
+            self.load_train_info()
+        elif resp["code"] == "200":
+            if status == 2:
+                self.is_sign_in = True
+            else:
+                self.is_sign_out = True
+            self._log_clock_state()
+        elif self.reconcile == XybAccount.RECONCILE_DEFERRED:
+            self.need_verify = True
+        else:
+            self.load_train_info()
+
+    def verify(self):
+        """重新拉取实习详情以确认考勤状态"""
+        self.need_verify = False
+        self.load_train_info()
+
     def get_ip(self) -> str:
         """获得请求IP"""
-        self.session.headers.update(self.sign_header({}))
-        resp = self.session.get(url=XybSign.URL_IP)
-        resp = self._except_json_resp(resp)
+        resp = self._request("GET", XybSign.URL_IP)
         if resp["code"] == "200":
             return resp["data"]["ip"]
         else:
@@ -262,9 +515,7 @@ class XybAccount:
             'country': self.location['country'],
             'city': self.location['city']
         }
-        self.session.headers.update(self.sign_header(data))
-        resp = self.session.post(url=XybSign.URL_BEHAVIOR, data=data)
-        resp = self._except_json_resp(resp)
+        resp = self._request("POST", XybSign.URL_BEHAVIOR, data, idempotent=False)
         if resp["code"] != "200":
             self._request_error("发送签到信息失败", resp)
 
@@ -300,10 +551,8 @@ class XybAccount:
         if status not in (1, 2):
             raise RuntimeError(f"传入的签到类型错误:{status}")
         data = self._prepare_sign(status)
-        self.session.headers.update(self.sign_header(data))
-        resp = self.session.post(url=XybSign.URL_AUTO_CLOCK, data=data)
-        resp = self._except_json_resp(resp)
-        self.load_train_info()
+        resp = self._request("POST", XybSign.URL_AUTO_CLOCK, data, idempotent=False)
+        self._reconcile(status, resp)
         if resp["code"] != "200":
             self._request_error(f"无法进行【自动】{['签退', '签到'][status - 1]}", resp)
 
@@ -318,10 +567,8 @@ class XybAccount:
         if status not in (1, 2):
             raise RuntimeError(f"传入的签到类型错误:{status}")
         data = self._prepare_sign(status)
-        self.session.headers.update(self.sign_header(data))
-        resp = self.session.post(url=XybSign.URL_NEW_CLOCK, data=data)
-        resp = self._except_json_resp(resp)
-        self.load_train_info()
+        resp = self._request("POST", XybSign.URL_NEW_CLOCK, data, idempotent=False)
+        self._reconcile(status, resp)
         if resp["code"] != "200":
             self._request_error(f"无法进行【新增】{['签退', '签到'][status - 1]}", resp)
 
@@ -336,13 +583,31 @@ class XybAccount:
         if status not in (1, 2):
             raise RuntimeError(f"传入的签到类型错误:{status}")
         data = self._prepare_sign(status)
-        self.session.headers.update(self.sign_header(data))
-        resp = self.session.post(url=XybSign.URL_UPDATE_CLOCK, data=data)
-        resp = self._except_json_resp(resp)
-        self.load_train_info()
+        resp = self._request("POST", XybSign.URL_UPDATE_CLOCK, data, idempotent=False)
+        self._reconcile(status, resp)
         if resp["code"] != "200":
             self._request_error(f"无法进行【覆盖】{['签退', '签到'][status - 1]}", resp)
 
+    def plan(self, sign_type: bool, overwrite=False) -> str:
+        """
+        根据当前的考勤状态决定打卡动作，不发送任何请求
+
+        :param sign_type: 签到/签出类型
+        :param overwrite: 已经签到/签退时是否覆盖
+        :return: 打卡动作，参考XybAccount.ACTION_*
+        """
+        if sign_type:
+            if not self.is_sign_in:
+                return XybAccount.ACTION_AUTO
+            if not overwrite:
+                return XybAccount.ACTION_DONE
+            return XybAccount.ACTION_INELIGIBLE if self.is_sign_out else XybAccount.ACTION_UPDATE
+        if not self.is_sign_in:
+            return XybAccount.ACTION_INELIGIBLE
+        if not self.is_sign_out:
+            return XybAccount.ACTION_NEW
+        return XybAccount.ACTION_UPDATE if overwrite else XybAccount.ACTION_DONE
+
     def sign_in(self, overwrite=False) -> bool:
         """
         签到
@@ -350,22 +615,20 @@ class XybAccount:
         :param overwrite: 已经签到时是否覆盖
         :return 签到结果
         """
-        if self.is_sign_in:
-            if overwrite:
-                if not self.is_sign_out:
-                    self.update_sign(2)
-                    self.logger.info("签到完成：覆盖模式")
-                    return True
-                else:
-                    self.logger.error("已签退，无法进行签到")
-                    return False
-            else:
-                self.logger.warning("已经进行过签到，本次操作未进行...")
-                return False
-        else:
+        action = self.plan(True, overwrite)
+        if action == XybAccount.ACTION_AUTO:
             self.auto_sign(2)
             self.logger.info("签到完成：自动触发模式")
             return True
+        if action == XybAccount.ACTION_UPDATE:
+            self.update_sign(2)
+            self.logger.info("签到完成：覆盖模式")
+            return True
+        if action == XybAccount.ACTION_DONE:
+            self.logger.warning("已经进行过签到，本次操作未进行...")
+        else:
+            self.logger.error("已签退，无法进行签到")
+        return False
 
     def sign_out(self, overwrite=False) -> bool:
         """
@@ -374,35 +637,59 @@ class XybAccount:
         :param overwrite: 已经签退时是否覆盖
         :return 签退结果
         """
-        if self.is_sign_in:
-            if self.is_sign_out:
-                if overwrite:
-                    self.update_sign(1)
-                    self.logger.info("签退完成：覆盖模式")
-                    return True
-                else:
-                    self.logger.warning("已经进行过签退，本次操作未进行...")
-                    return False
-            else:
-                self.new_sign(1)
-                self.logger.info("签退完成：新增记录模式")
-                return True
+        action = self.plan(False, overwrite)
+        if action == XybAccount.ACTION_NEW:
+            self.new_sign(1)
+            self.logger.info("签退完成：新增记录模式")
+            return True
+        if action == XybAccount.ACTION_UPDATE:
+            self.update_sign(1)
+            self.logger.info("签退完成：覆盖模式")
+            return True
+        if action == XybAccount.ACTION_DONE:
+            self.logger.warning("已经进行过签退，本次操作未进行...")
         else:
             self.logger.error("无法进行签退，必须先进行签到操作")
-            return False
+        return False
+
+
+def _state_property(field: str) -> property:
+    def getter(self: XybAccount):
+        return getattr(self.state, field)
+
+    def setter(self: XybAccount, value):
+        setattr(self.state, field, value)
+
+    return property(getter, setter)
+
+
+for _field in AccountState.__slots__:
+    setattr(XybAccount, _field, _state_property(_field))
 
 
 class XybSign:
-    URL_LOGIN_PHONE = "https://xcx.xybsyw.com/login/login.action"
-    URL_LOGIN_WX = "https://xcx.xybsyw.com/login/login!wx.action"
-    URL_ACCOUNT = "https://xcx.xybsyw.com/account/LoadAccountInfo.action"
-    URL_IP = "https://xcx.xybsyw.com/behavior/Duration!getIp.action"
-    URL_TRAIN = "https://xcx.xybsyw.com/student/clock/GetPlan!getDefault.action"
-    URL_TRAIN_INFO = "https://xcx.xybsyw.com/student/clock/GetPlan!detail.action"
+    BASE_URL = os.environ.get("XYB_BASE_URL", "https://xcx.xybsyw.com")
+    PATHS = {
+        "URL_LOGIN_PHONE": "/login/login.action",
+        "URL_LOGIN_WX": "/login/login!wx.action",
+        "URL_ACCOUNT": "/account/LoadAccountInfo.action",
+        "URL_IP": "/behavior/Duration!getIp.action",
+        "URL_TRAIN": "/student/clock/GetPlan!getDefault.action",
+        "URL_TRAIN_INFO": "/student/clock/GetPlan!detail.action",
+        "URL_AUTO_CLOCK": "/student/clock/Post!autoClock.action",
+        "URL_NEW_CLOCK": "/student/clock/PostNew.action",
+        "URL_UPDATE_CLOCK": "/student/clock/Post!updateClock.action"
+    }
+    URL_LOGIN_PHONE = BASE_URL + PATHS["URL_LOGIN_PHONE"]
+    URL_LOGIN_WX = BASE_URL + PATHS["URL_LOGIN_WX"]
+    URL_ACCOUNT = BASE_URL + PATHS["URL_ACCOUNT"]
+    URL_IP = BASE_URL + PATHS["URL_IP"]
+    URL_TRAIN = BASE_URL + PATHS["URL_TRAIN"]
+    URL_TRAIN_INFO = BASE_URL + PATHS["URL_TRAIN_INFO"]
     URL_BEHAVIOR = "https://app.xybsyw.com/behavior/Duration.action"
-    URL_AUTO_CLOCK = "https://xcx.xybsyw.com/student/clock/Post!autoClock.action"
-    URL_NEW_CLOCK = "https://xcx.xybsyw.com/student/clock/PostNew.action"
-    URL_UPDATE_CLOCK = "https://xcx.xybsyw.com/student/clock/Post!updateClock.action"
+    URL_AUTO_CLOCK = BASE_URL + PATHS["URL_AUTO_CLOCK"]
+    URL_NEW_CLOCK = BASE_URL + PATHS["URL_NEW_CLOCK"]
+    URL_UPDATE_CLOCK = BASE_URL + PATHS["URL_UPDATE_CLOCK"]
 
     HEADERS = {
         "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/53.0.2785.143 Safari/537.36 MicroMessenger/7.0.9.501 NetType/WIFI MiniProgramEnv/Windows WindowsWechat",
@@ -410,62 +697,579 @@ class XybSign:
         "Accept-Encoding": "gzip, deflate"
     }
 
-    def __init__(self, file="accounts.json"):
-        self.logger = logging.Logger("XybSign", logging.INFO)
-        init_logger(self.logger)
+    @classmethod
+    def set_base_url(cls, base_url: str):
+        """
+        修改接口地址，用于连接测试服务器等场景(已弃用的行为记录接口除外)
+
+        :param base_url: 接口地址，如https://xcx.xybsyw.com
+        """
+        cls.BASE_URL = base_url.rstrip("/")
+        for name, path in cls.PATHS.items():
+            setattr(cls, name, cls.BASE_URL + path)
+
+    def __init__(self, file="accounts.json", workers: int = 1, lazy: bool = False, cache: SessionCache = None,
+                 reconcile: str = XybAccount.RECONCILE_RESPONSE, hook_workers: int = 4, hook_timeout: float = 10,
+                 hook_retries: int = 1, shard: Tuple[int, int] = None, streaming: bool = False,
+                 metrics_file: str = None, journal: str = None, adaptive: bool = False, history: str = None,
+                 profile: bool = False, keep_results: bool = None):
+        """
+        :param file: 账户配置文件
+        :param workers: 账户载入与批量任务的并发数，为1时逐个执行
+        :param lazy: 延迟登录，为True时账户将在批量任务中登录，登录完成即开始签到
+        :param cache: 会话缓存，命中时账户将跳过登录流程
+        :param reconcile: 打卡后的考勤状态同步方式，参考XybAccount.RECONCILE_*
+        :param hook_workers: Webhooks回调并发数
+        :param hook_timeout: 单次Webhook回调超时时间(秒)
+        :param hook_retries: Webhook回调出现异常时的重试次数
+        :param shard: 分片下标与数量，指定时仅载入属于该分片的账户，参考shard模块
+        :param streaming: 流式执行，账户配置在批量任务中逐个读取并登录，完成后立即释放，适用于账户数量很多的情况
+        :param metrics_file: 运行指标的导出路径前缀，批量任务结束后写入<metrics_file>.json与<metrics_file>.prom
+        :param journal: 任务日志目录，指定时逐个记录账户结果，当天再次执行时跳过已成功的账户，账户将延迟登录
+        :param adaptive: 自适应并发限制，根据服务器的耗时与失败率在并发数以内调整同时进行的请求数，失败率过高时熔断
+        :param history: 历史记录数据库文件，指定时记录每次任务中各账户的结果，当天已成功的账户将跳过，账户将延迟登录
+        :param profile: 性能分析，批量任务期间记录各函数的耗时与内存分配，任务结束后输出报告，参考profiling模块
+        :param keep_results: 保留全部账户的回调数据，用于批量回调与任务报告的results字段；
+                             默认流式执行时不保留，此时不执行批量回调，内存占用不随账户数量增长
+        """
+        self.logger = logs.get_logger("XybSign")
+        self.workers = max(1, int(workers))
+        self.file = file
+        if shard and not 0 <= shard[0] < shard[1]:
+            raise ValueError(f"分片下标超出范围：{shard[0]}/{shard[1]}")
+        self.shard = shard
+        self.streaming = streaming
+        self.keep_results = not streaming if keep_results is None else keep_results
+        self.journal = journal
+        self.history = None
+        if history:
+            # sqlite3仅在启用历史记录时导入，减少冷启动耗时
+            from history import HistoryStore
+            self.history = HistoryStore(history)
+        # 已完成的账户需要在登录前跳过
+        self.lazy = lazy or streaming or bool(journal) or bool(history)
+        self.cache = cache
+        self.reconcile = reconcile
+        self.hook_workers = hook_workers
+        self.hook_timeout = hook_timeout
+        self.hook_retries = hook_retries
+        self.metrics = Metrics()
+        self.metrics_file = metrics_file
+        self.profile = profile
+        transport.configure(max(self.workers, transport.POOL_MAXSIZE))
+        throttle.configure(adaptive, initial=self.workers, maximum=self.workers)
+        self._accounts = list()
+        if self.streaming:
+            self.logger.info("流式执行：账户将在任务中逐个载入")
+            return
         with open(file, encoding="utf-8") as fp:
             accounts = json.load(fp)
-        self._accounts = list()
-        for acc in accounts:
-            try:
-                self._accounts.append(XybAccount(**acc))
-            except Exception as err:
-                self.logger.error("载入账户时出现异常")
-                self.logger.exception(err)
-        self.logger.info(f"已载入 {len(self._accounts)} 个账号")
+        if shard:
+            from shard import select_shard
+            accounts = select_shard(accounts, *shard)
+            self.logger.info(f"分片 {shard[0]}/{shard[1]}：{len(accounts)} 个账户")
+        self._accounts = [acc for acc in self._map(self._load_account, accounts) if acc]
+        self._save_cache()
+        if self.lazy:
+            self.logger.info(f"已载入 {len(self._accounts)} 个账号配置，将在任务中登录")
+        else:
+            self.logger.info(f"已载入 {len(self._accounts)} 个账号")
+
+    def _map(self, func: Callable, items: Iterable) -> Iterable:
+        """
+        按并发数执行任务，结果顺序与输入保持一致
+
+        :param func: 任务函数
+        :param items: 任务参数
+        :return: 任务结果
+        """
+        items = tuple(items)
+        if self.workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as executor:
+                return list(executor.map(func, items))
+        return (func(item) for item in items)
+
+    def _load_account(self, config: dict) -> Optional[XybAccount]:
+        """
+        载入单个账户，出现异常时返回None
+
+        :param config: 账户配置
+        :return: 账户
+        """
+        try:
+            return XybAccount(lazy=self.lazy, cache=self.cache, reconcile=self.reconcile, metrics=self.metrics,
+                              **config)
+        except Exception as err:
+            self.logger.error("载入账户时出现异常")
+            self.logger.exception(err)
+
+    def _save_cache(self):
+        """保存会话缓存，写入失败不影响任务"""
+        if not self.cache:
+            return
+        try:
+            self.cache.save()
+        except OSError as err:
+            self.logger.warning(f"会话缓存写入失败：{err}")
+
+    def _record_journal(self, journal: Optional[RunJournal], acc: XybAccount, webhook_data: dict):
+        """记录账户结果到任务日志，写入失败不影响任务"""
+        if not journal:
+            return
+        try:
+            journal.record(acc.key, webhook_data["result"], webhook_data)
+        except OSError as err:
+            self.logger.warning(f"任务日志写入失败：{err}")
+
+    def _export_metrics(self):
+        """导出运行指标，写入失败不影响任务"""
+        if not self.metrics_file:
+            return
+        try:
+            self.metrics.export(self.metrics_file)
+        except OSError as err:
+            self.logger.warning(f"运行指标导出失败：{err}")
+
+    def _log_transport_stats(self):
+        """输出共用连接池的连接复用情况与并发限制状态"""
+        for host, stat in transport.stats().items():
+            self.logger.info(f"连接复用：{host} 请求 {stat['requests']} 次，新建连接 {stat['connections']} 个，"
+                             f"复用 {stat['reused']} 次")
+        for host, state in throttle.stats().items():
+            self.logger.info(f"并发限制：{host} 窗口 {state['limit']}，失败率 {state['error_rate']:.1%}，"
+                             f"熔断状态 {state['breaker']}")
+            self.metrics.set("xyb_limiter_limit", state["limit"], host=host)
+            self.metrics.set("xyb_limiter_open", int(state["breaker"] != throttle.CLOSED), host=host)
+
+    def _scope(self) -> str:
+        """批量任务的账户范围描述"""
+        return "流式载入的全部账户" if self.streaming else f"{len(self._accounts)} 个账户"
 
     def get_accounts(self) -> Tuple[XybAccount]:
         """获得账户OpenId列表，便于后续的登录操作"""
         return tuple(self._accounts)
 
-    def _batch_task(self, sign_type: bool, *args):
+    def snapshot(self, file: str) -> int:
+        """
+        保存已载入账户的状态快照，包括会话与考勤状态
+
+        :param file: 快照文件
+        :return: 账户数量
+        """
+        return dump_states((acc.state for acc in self._accounts), file)
+
+    def restore(self, file: str) -> int:
+        """
+        从状态快照恢复账户，替换当前已载入的账户；恢复的账户将在任务前重新拉取考勤状态，会话失效时重新登录
+
+        :param file: 快照文件
+        :return: 账户数量
+        """
+        self._accounts = [XybAccount(lazy=True, cache=self.cache, reconcile=self.reconcile, metrics=self.metrics,
+                                     state=state) for state in load_states(file)]
+        self.logger.info(f"已从快照恢复 {len(self._accounts)} 个账户")
+        return len(self._accounts)
+
+    def _webhook_data(self, acc: XybAccount, sign_type: bool, task_result: bool, user_info: bool = True) -> dict:
+        """
+        构建单个账户的回调数据
+
+        :param acc: 账户
+        :param sign_type: 签到/签出类型
+        :param task_result: 任务执行结果
+        :param user_info: 是否按需拉取用户信息
+        :return: 回调数据
+        """
+        if user_info:
+            acc.ensure_user_info()
+        return {
+            "openid": acc.open_id,
+            "username": acc.account,
+            "loginer_id": acc.loginer_id,
+            "name": acc.user_name,
+            "phone": acc.phone,
+            "train_type": bool(acc.train_type),
+            "train_id": acc.train_id,
+            "post_type": bool(acc.post_state),
+            "sign_type": sign_type,
+            "result": task_result,
+            "is_sign_in": acc.is_sign_in,
+            "is_sign_out": acc.is_sign_out,
+            "timings": self._pop_timings(acc),
+            "error": acc.last_error
+        }
+
+    @staticmethod
+    def _pop_timings(acc: XybAccount) -> dict:
+        """取出账户各接口的累计耗时(秒)"""
+        timings = {endpoint: round(elapsed, 4) for endpoint, elapsed in acc.timings.items()}
+        acc.timings.clear()
+        return timings
+
+    def _dispatcher(self, sign_type: bool) -> WebhookDispatcher:
+        """
+        创建Webhooks回调分发
+
+        :param sign_type: 签到/签出类型
+        """
+        return WebhookDispatcher(sign_type, workers=self.hook_workers, timeout=self.hook_timeout,
+                                 retries=self.hook_retries, logger=self.logger, metrics=self.metrics)
+
+    def _ensure_state(self, acc: XybAccount) -> bool:
+        """
+        确保账户已登录且考勤状态未过期，未登录的账户将先进行登录
+
+        :param acc: 账户
+        :return: 是否成功，出现异常时返回False
+        """
+        try:
+            if not acc.train_init:
+                acc.bootstrap()
+            elif acc.stale:
+                acc.refresh()
+            return True
+        except Exception as err:
+            self.logger.error("载入账户时出现异常")
+            self.logger.exception(err)
+            return False
+
+    def _plan_task(self, acc: XybAccount, sign_type: bool, overwrite=False, deadline: Deadline = None,
+                   journal: RunJournal = None) -> str:
+        """
+        获得单个账户的考勤状态并决定打卡动作
+
+        :param acc: 账户
+        :param sign_type: 签到/签出类型
+        :param overwrite: 已经签到/签退时是否覆盖
+        :param deadline: 截止时间，到达后不再拉取
+        :param journal: 任务日志，已成功的账户不再拉取
+        :return: 打卡动作，参考XybAccount.ACTION_*
+        """
+        if journal and journal.completed(acc.key) is not None:
+            return XybAccount.ACTION_DONE
+        if deadline and deadline.expired():
+            return XybAccount.ACTION_ERROR
+        acc.deadline = deadline
+        if not self._ensure_state(acc):
+            return XybAccount.ACTION_ERROR
+        return acc.plan(sign_type, overwrite)
+
+    def _plan(self, accounts: Tuple[XybAccount], sign_type: bool, overwrite=False, deadline: Deadline = None,
+              journal: RunJournal = None) -> List[str]:
+        """
+        按并发数拉取全部账户的考勤状态，制定打卡计划；已有会话缓存的账户无需登录
+
+        :return: 与账户顺序一致的打卡动作
+        """
+        start = time.perf_counter()
+        plan = list(self._map(lambda acc: self._plan_task(acc, sign_type, overwrite, deadline, journal), accounts))
+        counter = Counter(plan)
+        self.logger.info(f"打卡计划({time.perf_counter() - start:.2f}秒)：" + "，".join(
+            f"{name} {counter[action]}" for action, name in XybAccount.ACTION_NAMES))
+        return plan
+
+    def prescan(self, sign_type: bool, overwrite=False, deadline: Deadline = None) -> dict:
+        """
+        预扫描：并发拉取全部账户的考勤状态并制定打卡计划，不进行任何打卡与回调，可作为批量任务的演练
+
+        :param sign_type: 签到/签出类型
+        :param overwrite: 已经签到/签退时是否覆盖
+        :param deadline: 截止时间，到达后剩余账户记为error
+        :return: 打卡计划，包括各动作的账户数与每个账户的动作
+        """
+        if self.streaming:
+            raise ValueError("流式执行不保留账户，不支持预扫描")
+        self.logger.info(f"预扫描{'签到' if sign_type else '签退'} {self._scope()}")
+        accounts = self.get_accounts()
+        plan = self._plan(accounts, sign_type, overwrite, deadline)
+        self._save_cache()
+        counter = Counter(plan)
+        logs.flush()
+        return {
+            "sign_type": sign_type,
+            "overwrite": overwrite,
+            "counts": {action: counter[action] for action, _ in XybAccount.ACTION_NAMES},
+            "accounts": [{
+                "openid": acc.open_id,
+                "username": acc.account,
+                "loginer_id": acc.loginer_id,
+                "name": acc.user_name,
+                "is_sign_in": acc.is_sign_in,
+                "is_sign_out": acc.is_sign_out,
+                "action": action
+            } for acc, action in zip(accounts, plan)]
+        }
+
+    def _run_task(self, acc: XybAccount, sign_type: bool, *args, dispatcher: WebhookDispatcher = None,
+                  deadline: Deadline = None, journal: RunJournal = None,
+                  idle: bool = False) -> Optional[Tuple[bool, dict]]:
+        """
+        单个账户任务，未登录的账户将先进行登录
+
+        :param acc: 账户
+        :param sign_type: 签到/签出类型
+        :param args: 任务参数
+        :param dispatcher: 回调分发，任务完成后立即提交回调
+        :param deadline: 截止时间，到达后不再开始新的账户任务，进行中的请求不超过截止时间
+        :param journal: 任务日志，已成功的账户直接返回记录的回调数据，不再回调
+        :param idle: 预扫描确认无需打卡的账户，到达截止时间后仍按考勤状态生成结果
+        :return: 任务结果与回调数据，账户载入失败时返回None
+        """
+        if journal:
+            webhook_data = journal.completed(acc.key)
+            if webhook_data is not None:
+                self.logger.info("任务日志中已完成，跳过账户：%s", webhook_data.get("loginer_id") or acc.key)
+                return True, webhook_data
+        if deadline and deadline.expired() and not idle:
+            self.logger.warning("剩余时间不足，跳过账户：%s", acc.loginer_id or acc.key)
+            webhook_data = self._webhook_data(acc, sign_type, False, user_info=False)
+            if dispatcher:
+                dispatcher.submit(webhook_data)
+            return False, webhook_data
+        acc.last_error = None
+        acc.deadline = deadline
+        if not self._ensure_state(acc):
+            return None
+        task_result = False
+        try:
+            task_result = acc.sign_in(*args) if sign_type else acc.sign_out(*args)
+        except RuntimeError as err:
+            self.logger.error("签到/退失败")
+            self.logger.exception(err)
+        # 到达截止时间后不再拉取用户信息
+        user_info = not (deadline and deadline.expired())
+        webhook_data = self._webhook_data(acc, sign_type, task_result, user_info=user_info)
+        # 考勤状态待确认的账户在确认后再记录与回调
+        if not acc.need_verify:
+            self._record_journal(journal, acc, webhook_data)
+            if dispatcher:
+                dispatcher.submit(webhook_data)
+        return task_result, webhook_data
+
+    def _schedule(self, accounts: Tuple[XybAccount], sign_type: bool) -> List[int]:
+        """
+        安排账户的执行顺序，尚未完成签到/签退的账户优先，未载入考勤状态的账户保持原有顺序
+
+        :param accounts: 账户列表
+        :param sign_type: 签到/签出类型
+        :return: 账户下标的执行顺序
+        """
+        def done(acc: XybAccount) -> bool:
+            return acc.train_init and (acc.is_sign_in if sign_type else acc.is_sign_out)
+
+        return sorted(range(len(accounts)), key=lambda i: done(accounts[i]))
+
+    def _verify_task(self, acc: XybAccount, webhook_data: dict, dispatcher: WebhookDispatcher = None,
+                     journal: RunJournal = None):
+        """
+        重新确认单个账户的考勤状态，并更新回调数据
+
+        :param acc: 账户
+        :param webhook_data: 回调数据
+        :param dispatcher: 回调分发，确认后立即提交回调
+        :param journal: 任务日志，确认后记录账户结果
+        """
+        try:
+            acc.verify()
+        except RuntimeError as err:
+            self.logger.error("确认考勤状态失败")
+            self.logger.exception(err)
+        webhook_data["is_sign_in"] = acc.is_sign_in
+        webhook_data["is_sign_out"] = acc.is_sign_out
+        self._record_journal(journal, acc, webhook_data)
+        if dispatcher:
+            dispatcher.submit(webhook_data)
+
+    def _list_results(self, sign_type: bool, *args, dispatcher: WebhookDispatcher, deadline: Deadline = None,
+                      journal: RunJournal = None, spread: float = 0,
+                      prescan: bool = False) -> List[Tuple[int, Optional[Tuple[bool, dict]]]]:
+        """
+        执行已载入账户的任务，指定截止时间时尚未完成的账户优先执行；
+        指定分散时间时，每个账户在[0, spread)秒内的随机时刻开始，按开始时刻的先后执行；
+        指定预扫描时，先并发制定打卡计划，无需打卡的账户不参与分散时间与截止时间的排序，在打卡账户完成后生成结果
+
+        :return: 与账户顺序一致的请求数与任务结果
+        """
+        accounts = self.get_accounts()
+        # 常驻运行时账户会执行多次任务，仅统计本次任务的请求数
+        request_counts = [acc.request_count for acc in accounts]
+        order = range(len(accounts))
+        idle = list()
+        if prescan:
+            plan = self._plan(accounts, sign_type, args[0] if args else False, deadline, journal)
+            idle = [i for i in order if plan[i] not in XybAccount.WORK_ACTIONS]
+            order = [i for i in order if plan[i] in XybAccount.WORK_ACTIONS]
+        if deadline:
+            order = [order[i] for i in self._schedule(tuple(accounts[i] for i in order), sign_type)]
+        start = time.monotonic()
+        offsets = [random.uniform(0, spread) for _ in accounts] if spread else None
+        if offsets:
+            order = sorted(order, key=offsets.__getitem__)
+
+        def run(i: int, idle_task: bool = False):
+            return self._run_task(accounts[i], sign_type, *args, dispatcher=dispatcher, deadline=deadline,
+                                  journal=journal, idle=idle_task)
+
+        def task(i: int):
+            if offsets:
+                wait = start + offsets[i] - time.monotonic()
+                if deadline:
+                    wait = min(wait, deadline.remaining())
+                if wait > 0:
+                    time.sleep(wait)
+            return run(i)
+
+        results = [None] * len(accounts)
+        for index, result in zip(order, self._map(task, order)):
+            results[index] = result
+        # 无需打卡的账户在打卡完成后再生成结果，拉取用户信息不占用打卡账户的时间
+        for index, result in zip(idle, self._map(lambda i: run(i, True), idle)):
+            results[index] = result
+        pending = [(acc, result[1]) for acc, result in zip(accounts, results) if result and acc.need_verify]
+        if pending and deadline and deadline.expired():
+            self.logger.warning(f"剩余时间不足，{len(pending)} 个账户的考勤状态未确认")
+            for _, webhook_data in pending:
+                dispatcher.submit(webhook_data)
+        elif pending:
+            self.logger.info(f"重新确认 {len(pending)} 个账户的考勤状态")
+            list(self._map(lambda item: self._verify_task(*item, dispatcher=dispatcher, journal=journal), pending))
+        return [(acc.request_count - count, result) for acc, count, result in zip(accounts, request_counts, results)]
+
+    def _stream_task(self, config: dict, sign_type: bool, *args, dispatcher: WebhookDispatcher,
+                     deadline: Deadline = None,
+                     journal: RunJournal = None) -> Tuple[int, Optional[Tuple[bool, dict]]]:
+        """
+        流式执行单个账户：载入、登录、签到、回调，完成后不再保留账户
+
+        :return: 请求数与任务结果
+        """
+        acc = self._load_account(config)
+        if acc is None:
+            return 0, None
+        result = self._run_task(acc, sign_type, *args, dispatcher=dispatcher, deadline=deadline, journal=journal)
+        if result and acc.need_verify:
+            self._verify_task(acc, result[1], dispatcher=dispatcher, journal=journal)
+        return acc.request_count, result
+
+    def _stream_results(self, sign_type: bool, *args, dispatcher: WebhookDispatcher, deadline: Deadline = None,
+                        journal: RunJournal = None) -> Iterator[Tuple[int, Optional[Tuple[bool, dict]]]]:
+        """
+        流式读取账户配置并执行任务，同时进行中的账户不超过并发数的两倍
+
+        :return: 与配置顺序一致的请求数与任务结果
+        """
+        configs = iter_accounts(self.file)
+        if self.shard:
+            from shard import shard_of
+            configs = (config for config in configs if shard_of(config, self.shard[1]) == self.shard[0])
+        if self.workers == 1:
+            for config in configs:
+                yield self._stream_task(config, sign_type, *args, dispatcher=dispatcher, deadline=deadline,
+                                        journal=journal)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            window = deque()
+            for config in configs:
+                window.append(executor.submit(self._stream_task, config, sign_type, *args, dispatcher=dispatcher,
+                                              deadline=deadline, journal=journal))
+                if len(window) >= self.workers * 2:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+
+    def _batch_task(self, sign_type: bool, *args, deadline: Deadline = None, spread: float = 0,
+                    prescan: bool = False):
         """
         批量任务
 
+        并发数大于1时使用线程池执行，计数与批量回调的数据顺序和逐个执行时保持一致，单个账户的回调在账户完成后立即提交；
+        指定截止时间时，尚未完成的账户优先执行(流式执行时按配置顺序)，到达截止时间后剩余账户计为失败；
+        指定任务日志时，当天已成功的账户直接计为成功，其回调数据仅用于批量回调；
+        指定历史记录时，各账户的结果在后台批量写入，未指定任务日志时同样跳过当天已成功的账户
+
         :param sign_type: 签到/签出类型
         :param args: 任务参数
+        :param deadline: 截止时间
+        :param spread: 分散时间(秒)，各账户在该时间内随机开始，避免同一时刻集中请求(流式执行时不支持)
+        :param prescan: 预扫描，先并发拉取全部账户的考勤状态，仅对需要打卡的账户执行打卡(流式执行时不支持)
+        :return: 任务报告，包括成功/失败计数与全部回调数据(未保留回调数据时为空)
         """
+        start = time.perf_counter()
         counter = Counter()
         webhook_queue = list()
-        for acc in self.get_accounts():
-            task_result = False
-            try:
-                ret = acc.sign_in(*args) if sign_type else acc.sign_out(*args)
-            except RuntimeError as err:
-                self.logger.error("签到/退失败")
-                self.logger.exception(err)
-                counter.update((False,))
-            else:
-                counter.update((ret,))
-                task_result = ret
-            finally:
-                webhook_data = {
-                    "openid": acc.open_id,
-                    "username": acc.account,
-                    "loginer_id": acc.loginer_id,
-                    "name": acc.user_name,
-                    "phone": acc.phone,
-                    "train_type": bool(acc.train_type),
-                    "train_id": acc.train_id,
-                    "post_type": bool(acc.post_state),
-                    "sign_type": sign_type,
-                    "result": task_result,
-                    "is_sign_in": acc.is_sign_in,
-                    "is_sign_out": acc.is_sign_out
-                }
+        dispatcher = self._dispatcher(sign_type)
+        journal = RunJournal(self.journal, sign_type) if self.journal else None
+        if journal and journal.count():
+            self.logger.info(f"任务日志：{journal.count()} 个账户已完成，将跳过")
+        run_id = None
+        if self.history:
+            run_id = self.history.start_run(sign_type)
+            if journal is None:
+                journal = self.history.completed(sign_type)
+                if journal.count():
+                    self.logger.info(f"历史记录：{journal.count()} 个账户今天已完成，将跳过")
+        if self.streaming:
+            if spread:
+                self.logger.warning("流式执行不支持分散时间，将按配置顺序执行")
+            if prescan:
+                self.logger.warning("流式执行不支持预扫描，将逐个账户执行")
+            results = self._stream_results(sign_type, *args, dispatcher=dispatcher, deadline=deadline,
+                                           journal=journal)
+        else:
+            results = self._list_results(sign_type, *args, dispatcher=dispatcher, deadline=deadline,
+                                         journal=journal, spread=spread, prescan=prescan)
+        account_count = request_count = 0
+        for requests_made, result in results:
+            account_count += 1
+            request_count += requests_made
+            if result is None:
+                continue
+            task_result, webhook_data = result
+            counter.update((task_result,))
+            if self.keep_results:
                 webhook_queue.append(webhook_data)
+            if self.history:
+                self.history.record(run_id, webhook_data, requests_made)
         self.logger.info(f"任务结束，{counter[True]}(成功) / {counter[False]}(失败)")
-        self.webhook(sign_type, webhook_queue)
+        self.logger.info(f"请求数：{request_count}，平均每账户 {request_count / max(account_count, 1):.1f} 次")
+        self._log_transport_stats()
+        self._save_cache()
+        if journal:
+            journal.close()
+        if self.history:
+            self.history.finish_run(run_id, counter[True], counter[False], request_count)
+        if not self.keep_results and dispatcher.batch_hook:
+            self.logger.info("未保留回调数据，跳过批量回调")
+        dispatcher.close(webhook_queue if self.keep_results else None)
+        logs.flush()
+        self.metrics.inc("xyb_accounts_total", counter[True], sign_type=sign_type, result=True)
+        self.metrics.inc("xyb_accounts_total", counter[False], sign_type=sign_type, result=False)
+        self.metrics.set("xyb_batch_duration_seconds", time.perf_counter() - start, sign_type=sign_type)
+        self._export_metrics()
+        return {
+            "sign_type": sign_type,
+            "success": counter[True],
+            "failure": counter[False],
+            "results": webhook_queue,
+            "metrics": self.metrics.to_dict()
+        }
+
+    def _run_batch(self, sign_type: bool, *args, **kwargs) -> dict:
+        """
+        执行批量任务，开启性能分析时在任务结束后输出报告，并添加到任务报告的profile字段中
+
+        :return: 任务报告
+        """
+        if not self.profile:
+            return self._batch_task(sign_type, *args, **kwargs)
+        # 性能分析模块仅在开启时导入
+        from profiling import Profiler
+        with Profiler() as profiler:
+            report = self._batch_task(sign_type, *args, **kwargs)
+        report["profile"] = profiler.report()
+        self.logger.info(profiler.format_report(report["profile"]))
+        logs.flush()
+        return report
 
     def webhook(self, sign_type: bool, hook_data: list):
         """
@@ -474,35 +1278,38 @@ class XybSign:
         :param sign_type: 签到/签出类型
         :param hook_data: 回调数据
         """
-
-        counter = Counter()
+        dispatcher = self._dispatcher(sign_type)
         for data in hook_data:
-            try:
-                on_sign_in(data) if sign_type else on_sign_out(data)
-                counter.update((True,))
-            except Exception as err:
-                self.logger.error("调用Webhook时出现异常")
-                self.logger.exception(err)
-                counter.update((False,))
-        self.logger.info(f"Webhooks: {len(hook_data)} || {counter[True]}(完成) / {counter[False]}(失败)")
+            dispatcher.submit(data)
+        dispatcher.close(hook_data)
 
-    def sign_in_all(self, overwrite=False):
+    def sign_in_all(self, overwrite=False, deadline: Deadline = None, spread: float = 0,
+                     prescan: bool = False) -> dict:
         """
         批量签到
 
         :param overwrite: 已经签到时是否覆盖
+        :param deadline: 截止时间，到达后不再开始新的账户任务
+        :param spread: 分散时间(秒)，各账户在该时间内随机开始
+        :param prescan: 预扫描，先并发拉取全部账户的考勤状态，仅对需要签到的账户执行签到
+        :return: 任务报告
         """
-        self.logger.info(f"开始批量签到 {len(self._accounts)} 个账户")
-        self._batch_task(True, overwrite)
+        self.logger.info(f"开始批量签到 {self._scope()}")
+        return self._run_batch(True, overwrite, deadline=deadline, spread=spread, prescan=prescan)
 
-    def sign_out_all(self, overwrite=False):
+    def sign_out_all(self, overwrite=False, deadline: Deadline = None, spread: float = 0,
+                      prescan: bool = False) -> dict:
         """
         批量签退
 
         :param overwrite: 已经签退时是否覆盖
+        :param deadline: 截止时间，到达后不再开始新的账户任务
+        :param spread: 分散时间(秒)，各账户在该时间内随机开始
+        :param prescan: 预扫描，先并发拉取全部账户的考勤状态，仅对需要签退的账户执行签退
+        :return: 任务报告
         """
-        self.logger.info(f"开始批量签退 {len(self._accounts)} 个账户")
-        self._batch_task(False, overwrite)
+        self.logger.info(f"开始批量签退 {self._scope()}")
+        return self._run_batch(False, overwrite, deadline=deadline, spread=spread, prescan=prescan)
 
 
 if __name__ == '__main__':